@@ -2,129 +2,287 @@
 """
 Batch COP Data Extraction from Multiple ACFR Years
 Processes multiple years of ACFR files and creates structured output
+Years are analyzed in parallel worker processes; --serial runs them one
+after another. Both produce the same report. Where extract_acfr_text.py
+saved a year's tables as typed records (*_COP_tables.parquet, or .json
+when it ran without pyarrow), the debt tables are read from there instead
+of being picked out of the text. Reading them needs pandas.
+
+Usage:
+  python batch_extract_cop_data.py [--serial] [--workers N]
 """
 
 import os
 import re
+import sys
 import json
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import find_spec
 from pathlib import Path
 from datetime import datetime
 
+from keyword_matcher import KeywordMatcher
+from pdf_tables import load_tables
+
+# Compiled once and matched against lowercased text. '.' never crosses a
+# newline, so matches stay on one line; the {0,200} bounds cap how far a
+# pattern can backtrack on very long lines (full-text pdftotext dumps).
+FINANCIAL_PATTERNS = {
+    'total_cop_debt': [
+        re.compile(r'total.{0,200}certificate.{0,200}participation.{0,200}?[$\s]*([0-9,]+)'),
+        re.compile(r'certificate.{0,200}participation.{0,200}total.{0,200}?[$\s]*([0-9,]+)'),
+        re.compile(r'outstanding.{0,200}cop.{0,200}debt.{0,200}?[$\s]*([0-9,]+)'),
+    ],
+    'debt_service': [
+        re.compile(r'debt\s+service.{0,200}?[$\s]*([0-9,]+)'),
+        re.compile(r'annual.{0,200}debt.{0,200}service.{0,200}?[$\s]*([0-9,]+)'),
+        re.compile(r'principal.{0,200}interest.{0,200}total.{0,200}?[$\s]*([0-9,]+)'),
+    ],
+    'individual_cops': [
+        re.compile(r'(e[aprs]|m[ds])\s*\d+.{0,200}?[$\s]*([0-9,]+)'),
+        re.compile(r'series\s+(e[aprs]|m[ds]).{0,200}?[$\s]*([0-9,]+)'),
+    ],
+    'interest_rates': [
+        re.compile(r'(\d+\.\d+)%.{0,200}interest'),
+        re.compile(r'interest.{0,200}rate.{0,200}?(\d+\.\d+)%'),
+    ],
+    'maturity_dates': [
+        re.compile(r'matur\w+.{0,200}?(\d{4})'),
+        re.compile(r'due.{0,200}?(\d{1,2}/\d{1,2}/\d{4})'),
+    ],
+}
+
+# Common table headers for COP debt
+DEBT_TABLE_INDICATORS = [
+    'certificate of participation',
+    'outstanding debt',
+    'debt service schedule',
+    'principal amount',
+    'maturity date'
+]
+
+# \s runs in the patterns can cross line breaks (through any number of
+# blank lines), so a match can end up to this many non-blank lines below
+# the line it starts on
+PATTERN_LOOKAHEAD = 2
+_BLANK_LINE = re.compile(r'[$\s]*')
+
+# Lines handed to the regexes at a time when streaming a file; memory use
+# depends on this, not on the file size
+BLOCK_LINES = 1000
+
+EXTRACTED_SUFFIX = "_COP_extracted.txt"
+TABLES_SUFFIX = "_COP_tables.parquet"
+# Written instead of the parquet file when pandas/pyarrow are missing
+TABLES_JSON_SUFFIX = "_COP_tables.json"
+
 def extract_financial_patterns(text):
     """Extract financial data using regex patterns"""
     
-    patterns = {
-        'total_cop_debt': [
-            r'total.*certificate.*participation.*?[\$\s]*([0-9,]+)',
-            r'certificate.*participation.*total.*?[\$\s]*([0-9,]+)',
-            r'outstanding.*cop.*debt.*?[\$\s]*([0-9,]+)',
-        ],
-        'debt_service': [
-            r'debt\s+service.*?[\$\s]*([0-9,]+)',
-            r'annual.*debt.*service.*?[\$\s]*([0-9,]+)',
-            r'principal.*interest.*total.*?[\$\s]*([0-9,]+)',
-        ],
-        'individual_cops': [
-            r'(EA|EP|ER|ES|MD|MS)\s*\d+.*?[\$\s]*([0-9,]+)',
-            r'series\s+(EA|EP|ER|ES|MD|MS).*?[\$\s]*([0-9,]+)',
-        ],
-        'interest_rates': [
-            r'(\d+\.\d+)%.*interest',
-            r'interest.*rate.*?(\d+\.\d+)%',
-        ],
-        'maturity_dates': [
-            r'matur\w+.*?(\d{4})',
-            r'due.*?(\d{1,2}/\d{1,2}/\d{4})',
-        ]
-    }
-    
     results = {}
     text_lower = text.lower()
     
-    for category, pattern_list in patterns.items():
+    for category, pattern_list in FINANCIAL_PATTERNS.items():
         matches = []
         for pattern in pattern_list:
-            found = re.findall(pattern, text_lower, re.IGNORECASE | re.MULTILINE)
-            matches.extend(found)
+            matches.extend(pattern.findall(text_lower))
         
         results[category] = matches
     
     return results
 
-def parse_debt_tables(text):
-    """Look for structured debt tables"""
-    
-    # Common table headers for COP debt
-    table_indicators = [
-        'certificate of participation',
-        'outstanding debt',
-        'debt service schedule',
-        'principal amount',
-        'maturity date'
-    ]
-    
-    lines = text.split('\n')
-    table_sections = []
+def _line_blocks(lines, size=BLOCK_LINES):
+    """(block, window) pairs: up to `size` lines, and the lowercased block followed by the lines a match can reach"""
+    buffer = []
+    ahead = 0  # non-blank lines in buffer past the block
+    for line in lines:
+        buffer.append(line.rstrip('\n'))
+        if len(buffer) > size and not _BLANK_LINE.fullmatch(buffer[-1]):
+            ahead += 1
+        while ahead >= PATTERN_LOOKAHEAD:
+            block, buffer = buffer[:size], buffer[size:]
+            yield block, '\n'.join(block + buffer).lower()
+            ahead = sum(1 for line in buffer[size:] if not _BLANK_LINE.fullmatch(line))
+    # End of input: the last blocks run to the last line
+    while buffer:
+        yield buffer[:size], '\n'.join(buffer).lower()
+        buffer = buffer[size:]
+
+def _offset(window, line):
+    """Offset of the start of the given (0-based) line in window"""
+    offset = 0
+    for _ in range(line):
+        offset = window.index('\n', offset) + 1
+    return offset
+
+def scan_cop_lines(lines, patterns=True, tables=True):
+    """Scan a stream of lines once, yielding findings as they are found
+
+    Yields ('pattern', category, index, match) for each FINANCIAL_PATTERNS
+    match (index is the pattern's position in its category) and
+    ('table', section) for each debt table section once it closes. Lines
+    are consumed in blocks of BLOCK_LINES, so memory does not grow with
+    the file; the results equal running the patterns and parse_debt_tables
+    over the whole text.
+    """
+    compiled = [(category, index, pattern) for category, pattern_list in FINANCIAL_PATTERNS.items()
+                for index, pattern in enumerate(pattern_list)] if patterns else []
+    # Where a pattern picks up after a match that ran past its block: (line, column)
+    resume = {}
+    indicators = KeywordMatcher(DEBT_TABLE_INDICATORS)
     current_section = []
     in_table = False
-    
-    for line in lines:
-        line_lower = line.lower().strip()
-        
-        # Check if this line indicates a debt table
-        if any(indicator in line_lower for indicator in table_indicators):
-            if current_section:
-                table_sections.append('\n'.join(current_section))
-                current_section = []
-            in_table = True
-            current_section.append(line)
-        elif in_table:
-            # Continue collecting table data
-            if line.strip():
+    first_line = 0
+
+    for block, window in _line_blocks(lines):
+        block_end = window.find('\n', _offset(window, len(block) - 1))
+        if block_end == -1:
+            block_end = len(window)
+        for n, (category, index, pattern) in enumerate(compiled):
+            position = 0
+            if n in resume:
+                line, column = resume[n]
+                if line >= first_line + len(block):
+                    continue
+                position = _offset(window, line - first_line) + column
+                del resume[n]
+            while True:
+                match = pattern.search(window, position)
+                # Matches starting further down are found with the next block
+                if not match or match.start() >= block_end:
+                    break
+                groups = match.groups('')
+                yield 'pattern', category, index, groups if len(groups) > 1 else groups[0]
+                position = match.end()
+                if position > block_end:
+                    line_start = window.rfind('\n', 0, position) + 1
+                    resume[n] = (first_line + window.count('\n', 0, position), position - line_start)
+                    break
+        first_line += len(block)
+
+        if not tables:
+            continue
+        indicator_lines = set(indicators.matching_lines('\n'.join(block)))
+        for i, line in enumerate(block):
+            # Check if this line indicates a debt table
+            if i in indicator_lines:
+                if current_section:
+                    yield 'table', '\n'.join(current_section)
+                    current_section = []
+                in_table = True
                 current_section.append(line)
-            else:
-                # Empty line might end the table
-                if len(current_section) > 5:  # Only keep substantial sections
-                    table_sections.append('\n'.join(current_section))
-                current_section = []
-                in_table = False
-    
+            elif in_table:
+                # Continue collecting table data
+                if line.strip():
+                    current_section.append(line)
+                else:
+                    # Empty line might end the table
+                    if len(current_section) > 5:  # Only keep substantial sections
+                        yield 'table', '\n'.join(current_section)
+                    current_section = []
+                    in_table = False
+
     # Don't forget the last section
     if current_section and len(current_section) > 5:
-        table_sections.append('\n'.join(current_section))
-    
-    return table_sections
+        yield 'table', '\n'.join(current_section)
+
+def parse_debt_tables(text):
+    """Look for structured debt tables"""
+    return [finding[1] for finding in scan_cop_lines(text.split('\n'), patterns=False)]
+
+def read_lines(file_path, counter=None):
+    """Lines of a text file (newlines kept), read one at a time
+
+    counter['chars'] is kept up to date with the characters read so far.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if counter is not None:
+                counter['chars'] += len(line)
+            yield line
+
+def fiscal_year_from_name(file_path):
+    """Fiscal year from the file name ("Unknown" if there is none)"""
+    year_match = re.search(r'(20\d{2})', Path(file_path).name)
+    return year_match.group(1) if year_match else "Unknown"
+
+def _strip_suffix(name, suffix):
+    """name without suffix (str.removesuffix needs Python 3.9)"""
+    return name[:-len(suffix)] if name.endswith(suffix) else name
+
+def tables_path(file_path):
+    """The typed tables file saved next to an extracted text file (parquet, else JSON)"""
+    file_path = Path(file_path)
+    stem = _strip_suffix(file_path.name, EXTRACTED_SUFFIX)
+    parquet = file_path.with_name(stem + TABLES_SUFFIX)
+    json_path = file_path.with_name(stem + TABLES_JSON_SUFFIX)
+    return json_path if json_path.exists() and not parquet.exists() else parquet
 
-def analyze_extracted_file(file_path):
-    """Analyze a single extracted text file for COP data"""
+def load_cop_tables(extracted_files_dir):
+    """Every year's typed table records as one DataFrame, with a fiscal_year column"""
+    extracted_files_dir = Path(extracted_files_dir)
+    paths = sorted(extracted_files_dir.glob(f"*{TABLES_SUFFIX}"))
+    paths += [path for path in sorted(extracted_files_dir.glob(f"*{TABLES_JSON_SUFFIX}"))
+              if not path.with_name(_strip_suffix(path.name, TABLES_JSON_SUFFIX) + TABLES_SUFFIX).exists()]
+    tables = load_tables(paths)
+    tables.insert(0, 'fiscal_year', tables['source_file'].map(fiscal_year_from_name))
+    return tables
+
+def debt_tables(tables):
+    """Summary of each table whose cells mention a DEBT_TABLE_INDICATORS phrase"""
+    indicators = KeywordMatcher(DEBT_TABLE_INDICATORS)
+    found = []
+    for (page, table_index), cells in tables.groupby(['page', 'table_index'], sort=True):
+        if not indicators.matches('\n'.join(cells['text'])):
+            continue
+        values = cells['value'].dropna()
+        found.append({
+            'page': int(page),
+            'table_index': int(table_index),
+            'header': [' '.join(text.split()) for text in cells.loc[cells['is_header'], 'text']],
+            'rows': int(cells['row'].max()) + 1,
+            'numeric_cells': len(values),
+            'largest_value': float(values.abs().max()) if len(values) else None,
+        })
+    return found
+
+def analyze_extracted_file(file_path, analysis_date=None):
+    """Analyze a single extracted text file for COP data, streaming it line by line"""
     
     print(f"Analyzing: {file_path.name}")
     
+    # Extract year from filename
+    fiscal_year = fiscal_year_from_name(file_path)
+    
+    # Financial patterns and table sections come out of the same pass; the
+    # text heuristic for tables is only needed when there are no typed tables
+    matches = {category: [[] for _ in pattern_list] for category, pattern_list in FINANCIAL_PATTERNS.items()}
+    table_sections = []
+    typed_tables = tables_path(file_path)
+    typed = typed_tables.exists() and find_spec('pandas') is not None
+    counter = {'chars': 0}
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        for finding in scan_cop_lines(read_lines(file_path, counter), tables=not typed):
+            if finding[0] == 'pattern':
+                _, category, index, match = finding
+                matches[category][index].append(match)
+            else:
+                table_sections.append(finding[1])
     except Exception as e:
         print(f"Error reading {file_path}: {e}")
         return None
-    
-    # Extract year from filename
-    year_match = re.search(r'(20\d{2})', file_path.name)
-    fiscal_year = year_match.group(1) if year_match else "Unknown"
-    
-    # Extract financial patterns
-    financial_data = extract_financial_patterns(content)
-    
-    # Extract table sections
-    table_sections = parse_debt_tables(content)
+    financial_data = {category: [match for found in lists for match in found] for category, lists in matches.items()}
+    tables = debt_tables(load_tables(typed_tables)) if typed else []
     
     # Create summary
     summary = {
         'fiscal_year': fiscal_year,
         'source_file': file_path.name,
-        'analysis_date': datetime.now().isoformat(),
+        'analysis_date': analysis_date or datetime.now().isoformat(),
         'financial_patterns': financial_data,
         'table_sections': table_sections,
-        'raw_content_length': len(content),
+        'debt_tables': tables,
+        'raw_content_length': counter['chars'],
         'recommendations': []
     }
     
@@ -133,6 +291,8 @@ def analyze_extracted_file(file_path):
         summary['recommendations'].append("Found potential total COP debt figures")
     if financial_data['debt_service']:
         summary['recommendations'].append("Found debt service amounts")
+    if tables:
+        summary['recommendations'].append(f"Found {len(tables)} debt tables")
     if table_sections:
         summary['recommendations'].append(f"Found {len(table_sections)} potential debt tables")
     if not any(financial_data.values()):
@@ -140,8 +300,13 @@ def analyze_extracted_file(file_path):
     
     return summary
 
-def create_multi_year_analysis(extracted_files_dir):
-    """Create comprehensive analysis across multiple years"""
+def create_multi_year_analysis(extracted_files_dir, workers=None):
+    """Create comprehensive analysis across multiple years
+
+    Files are analyzed in a process pool (workers=1 runs them in this
+    process). Results are merged in fiscal-year order and every analysis
+    carries the same timestamp, so the report does not depend on the mode.
+    """
     
     extracted_dir = Path(extracted_files_dir)
     if not extracted_dir.exists():
@@ -149,7 +314,7 @@ def create_multi_year_analysis(extracted_files_dir):
         return
     
     # Find all extracted text files
-    text_files = list(extracted_dir.glob("*_COP_extracted.txt"))
+    text_files = list(extracted_dir.glob(f"*{EXTRACTED_SUFFIX}"))
     if not text_files:
         print("No extracted text files found. Run extract_acfr_text.py first.")
         return
@@ -157,18 +322,23 @@ def create_multi_year_analysis(extracted_files_dir):
     print(f"Found {len(text_files)} extracted files")
     
     # Analyze each file
-    all_analyses = []
-    for text_file in sorted(text_files):
-        analysis = analyze_extracted_file(text_file)
-        if analysis:
-            all_analyses.append(analysis)
+    text_files = sorted(text_files, key=lambda path: (fiscal_year_from_name(path), path.name))
+    analysis_date = datetime.now().isoformat()
+    dates = [analysis_date] * len(text_files)
+    if workers == 1:
+        results = map(analyze_extracted_file, text_files, dates)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map() returns results in submission order, whichever year finishes first
+            results = list(executor.map(analyze_extracted_file, text_files, dates))
+    all_analyses = [analysis for analysis in results if analysis]
     
     # Create comprehensive report
     report = {
         'analysis_summary': {
             'total_files_analyzed': len(all_analyses),
             'year_range': f"{min(a['fiscal_year'] for a in all_analyses)} - {max(a['fiscal_year'] for a in all_analyses)}",
-            'analysis_date': datetime.now().isoformat()
+            'analysis_date': analysis_date
         },
         'yearly_analyses': all_analyses,
         'cross_year_patterns': analyze_cross_year_patterns(all_analyses)
@@ -212,11 +382,11 @@ def analyze_cross_year_patterns(analyses):
         quality_score = 0
         quality_score += len(analysis['financial_patterns']['total_cop_debt'])
         quality_score += len(analysis['financial_patterns']['debt_service'])
-        quality_score += len(analysis['table_sections'])
+        quality_score += len(analysis['table_sections']) + len(analysis['debt_tables'])
         
         patterns['data_quality_by_year'][year] = quality_score
     
-    patterns['common_cop_series'] = list(patterns['common_cop_series'])
+    patterns['common_cop_series'] = sorted(patterns['common_cop_series'])
     
     return patterns
 
@@ -243,7 +413,7 @@ def create_readable_summary(report, output_dir):
             # Count findings
             total_debt_refs = len(analysis['financial_patterns']['total_cop_debt'])
             debt_service_refs = len(analysis['financial_patterns']['debt_service'])
-            table_count = len(analysis['table_sections'])
+            table_count = len(analysis['table_sections']) + len(analysis['debt_tables'])
             
             f.write(f"  - Total debt references: {total_debt_refs}\n")
             f.write(f"  - Debt service references: {debt_service_refs}\n")
@@ -291,8 +461,13 @@ def main():
         print("2. python batch_extract_cop_data.py")
         return
     
+    args = sys.argv[1:]
+    workers = 1 if '--serial' in args else None
+    if '--workers' in args:
+        workers = int(args[args.index('--workers') + 1])
+    
     print("🔍 Analyzing extracted COP content for patterns...")
-    report = create_multi_year_analysis(extracted_dir)
+    report = create_multi_year_analysis(extracted_dir, workers)
     
     if report:
         print(f"\n📊 Analysis complete!")
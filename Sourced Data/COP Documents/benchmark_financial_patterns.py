@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark batch_extract_cop_data.extract_financial_patterns
+Times the compiled, bounded FINANCIAL_PATTERNS against the original
+uncompiled patterns (unbounded .* run with IGNORECASE | MULTILINE) on the
+extracted COP text and on the full text of every cached PDF, and checks
+that both return the same matches.
+
+Usage:
+  python benchmark_financial_patterns.py [text_file ...]
+"""
+
+import re
+import sys
+import timeit
+
+from batch_extract_cop_data import FINANCIAL_PATTERNS, extract_financial_patterns
+from keyword_matcher import benchmark_texts
+
+# The patterns as they were before FINANCIAL_PATTERNS
+LEGACY_PATTERNS = {
+    'total_cop_debt': [
+        r'total.*certificate.*participation.*?[\$\s]*([0-9,]+)',
+        r'certificate.*participation.*total.*?[\$\s]*([0-9,]+)',
+        r'outstanding.*cop.*debt.*?[\$\s]*([0-9,]+)',
+    ],
+    'debt_service': [
+        r'debt\s+service.*?[\$\s]*([0-9,]+)',
+        r'annual.*debt.*service.*?[\$\s]*([0-9,]+)',
+        r'principal.*interest.*total.*?[\$\s]*([0-9,]+)',
+    ],
+    'individual_cops': [
+        r'(EA|EP|ER|ES|MD|MS)\s*\d+.*?[\$\s]*([0-9,]+)',
+        r'series\s+(EA|EP|ER|ES|MD|MS).*?[\$\s]*([0-9,]+)',
+    ],
+    'interest_rates': [
+        r'(\d+\.\d+)%.*interest',
+        r'interest.*rate.*?(\d+\.\d+)%',
+    ],
+    'maturity_dates': [
+        r'matur\w+.*?(\d{4})',
+        r'due.*?(\d{1,2}/\d{1,2}/\d{4})',
+    ]
+}
+
+
+def legacy_financial_patterns(text):
+    """extract_financial_patterns as it was before FINANCIAL_PATTERNS"""
+    text_lower = text.lower()
+    return {
+        category: [match for pattern in pattern_list
+                   for match in re.findall(pattern, text_lower, re.IGNORECASE | re.MULTILINE)]
+        for category, pattern_list in LEGACY_PATTERNS.items()
+    }
+
+
+def main():
+    texts = benchmark_texts(sys.argv[1:])
+    if not texts:
+        print("❌ Nothing to benchmark: run extract_acfr_text.py first or pass text files")
+        return
+
+    print(f"{'text':<60} {'chars':>9} {'legacy':>9} {'compiled':>9} {'matches':>8}")
+    legacy_total = compiled_total = 0.0
+    for label, text in texts.items():
+        # re caches compiled patterns, so time the legacy run warm as well
+        legacy = legacy_financial_patterns(text)
+        legacy_time = min(timeit.repeat(lambda: legacy_financial_patterns(text), number=1, repeat=5))
+        compiled = extract_financial_patterns(text)
+        compiled_time = min(timeit.repeat(lambda: extract_financial_patterns(text), number=1, repeat=5))
+        legacy_total += legacy_time
+        compiled_total += compiled_time
+
+        print(f"{label[:60]:<60} {len(text):>9,} {legacy_time * 1000:>7.1f}ms {compiled_time * 1000:>7.1f}ms "
+              f"{sum(len(m) for m in compiled.values()):>8}")
+        for category in FINANCIAL_PATTERNS:
+            if compiled[category] != legacy[category]:
+                print(f"  ❌ {category}: {len(legacy[category])} legacy vs {len(compiled[category])} compiled matches")
+
+    print(f"{'total':<60} {sum(len(t) for t in texts.values()):>9,} "
+          f"{legacy_total * 1000:>7.1f}ms {compiled_total * 1000:>7.1f}ms")
+    print(f"✅ {legacy_total / compiled_total:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+COP maturity schedule parser
+Reads the maturity schedule on the inside cover of each COP official
+statement (EA801455.pdf, ES1453108.pdf, ...) into one row per maturity:
+series, maturity date, principal, coupon rate and yield. Serial maturities
+come from the schedule rows (one or two per line), term certificates from
+the "$X Y% Term Certificate due ..." lines below them. Each series' total
+is checked against the par amount printed above it.
+
+Pages are found with the cached PyPDF2 text and read with pdfplumber
+through pdf_page_cache.sqlite, like extract_acfr_text.py. The schedules
+are not ruled tables, so the parser works on pdfplumber's text lines.
+The 2008 variable-rate statements (MD521658.pdf, MS620899.pdf) have a
+single due date and no schedule; they are reported and skipped.
+
+Rows are saved as parquet (requires pyarrow), sorted by series and
+maturity, so each series reads back as arrays of dates, principal and
+coupons. Term certificates are kept as one maturity each (their sinking
+fund installments are not split out), and preliminary statements
+("Subject to change") are flagged and left out of outstanding balances.
+
+Usage:
+  python cop_maturity_schedule.py [pdf ...] [--output FILE] [--as-of YYYY-MM-DD] [--workers N]
+"""
+
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+
+from extract_acfr_text import (LAYOUT_EXTRACTOR, PREFILTER_EXTRACTOR, PyPDF2, _squash,
+                               cached_extract_many, pdfplumber_pages, pypdf2_pages)
+from pdf_page_cache import connect, file_hash
+from pdf_tables import parse_number
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+OUTPUT_FILE = SCRIPT_DIR / "extracted_cop_content" / "cop_maturity_schedules.parquet"
+
+COLUMNS = ['source_file', 'series', 'maturity_date', 'principal', 'coupon_rate', 'yield_rate', 'term', 'preliminary']
+
+# Whitespace removed, this marks the schedule page (and the cover that points to it)
+SCHEDULE_MARKER = 'maturityschedule'
+
+# pdfplumber drops the spaces on some covers ('SERIES2013C', '(December15)')
+SERIES_HEADING = re.compile(r'SERIES\s*(\d{4}[A-Z]?(?:-\d)?)\s*$', re.IGNORECASE)
+PAR_AMOUNT = re.compile(r'^\$\s*(\d{1,3}(?:,\d{3})+)\*?$')
+MATURITY_DAY = re.compile(r'\(\s*([A-Z][a-z]+)\s*(\d{1,2})\s*\)')
+SERIAL_LINE = re.compile(r'^20\d{2}\s+\$?\s*\d')
+# Year, principal, then coupon and yield (or price) when the schedule has them
+SERIAL = re.compile(r'(?<![\d,.])(20\d{2})\s+\$?\s*(\d{1,3}(?:,\d{3})+)'
+                    r'(?:\s+(\d{1,2}\.\d+)%?(?:\s+(\d{1,3}(?:\.\d+)?)(?![\d,])%?)?)?')
+TERM = re.compile(r'\$\s*(\d{1,3}(?:,\d{3})+)\s*(\d{1,2}\.\d+)%\s*Term\s*Certificates?\s*due\s*'
+                  r'([A-Z][a-z]+)\s*(\d{1,2}),?\s*(\d{4})(?:.*?Yield\W*(\d+\.\d+)%)?', re.IGNORECASE)
+# Footnote to the starred amounts of a preliminary statement
+PRELIMINARY = re.compile(r'^\*\s*Subject\s*to\s*change', re.IGNORECASE | re.MULTILINE)
+
+
+def _maturity(month, day, year):
+    return datetime.strptime(f"{month} {day} {year}", "%B %d %Y").date()
+
+
+def _yield(token):
+    """A yield has decimals; a bare number in that column (100) is the issue price"""
+    return parse_number(token) if token and '.' in token else None
+
+
+def parse_maturity_schedule(text, source_file=None):
+    """(rows, {series: par amount}) from one page's text; rows is empty if it holds no schedule"""
+    rows, par = [], {}
+    series = amount = day = None
+    preliminary = PRELIMINARY.search(text) is not None
+    for line in (line.strip() for line in text.splitlines()):
+        if PAR_AMOUNT.match(line):
+            amount = parse_number(PAR_AMOUNT.match(line).group(1))
+        elif SERIES_HEADING.search(line):
+            series = SERIES_HEADING.search(line).group(1).upper()
+            if amount is not None:
+                par[series] = amount
+                amount = None
+        if MATURITY_DAY.search(line):
+            day = MATURITY_DAY.search(line).groups()
+
+        entries = []
+        if series and day and SERIAL_LINE.match(line):
+            entries = [(_maturity(*day, year), principal, rate, _yield(yield_rate), False)
+                       for year, principal, rate, yield_rate in SERIAL.findall(line)]
+        elif series and TERM.search(line):
+            principal, rate, month, term_day, year, yield_rate = TERM.search(line).groups()
+            entries = [(_maturity(month, term_day, year), principal, rate, _yield(yield_rate), True)]
+        for maturity, principal, rate, yield_rate, term in entries:
+            rows.append({
+                'source_file': source_file,
+                'series': series,
+                'maturity_date': maturity,
+                'principal': int(parse_number(principal)),
+                'coupon_rate': parse_number(rate) if rate else None,
+                'yield_rate': yield_rate,
+                'term': term,
+                'preliminary': preliminary,
+            })
+    return rows, par
+
+
+def extract_schedules(pdf_files, workers=None):
+    """{pdf_path: (rows, par)} from the first page of each PDF that holds a schedule"""
+    cache = connect()
+    documents = {}
+    for pdf_path in pdf_files:
+        page_count = len(PyPDF2.PdfReader(str(pdf_path)).pages)
+        documents[pdf_path] = (file_hash(pdf_path), list(range(1, page_count + 1)))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        raw = cached_extract_many(executor, cache, PREFILTER_EXTRACTOR, pypdf2_pages, documents)
+        candidates = {pdf_path: (documents[pdf_path][0], [page_num for page_num, (text, _) in sorted(pages.items())
+                                                          if text and SCHEDULE_MARKER in _squash(text)])
+                      for pdf_path, (pages, _) in raw.items()}
+        layout = cached_extract_many(executor, cache, LAYOUT_EXTRACTOR, pdfplumber_pages, candidates)
+    cache.close()
+
+    schedules = {}
+    for pdf_path in pdf_files:
+        pages = layout[pdf_path][0]
+        schedules[pdf_path] = next((parsed for page_num in sorted(pages)
+                                    if (parsed := parse_maturity_schedule(pages[page_num][0] or '', pdf_path.name))[0]),
+                                   ([], {}))
+    return schedules
+
+
+def schedules_frame(rows):
+    """DataFrame of maturity rows with fixed column types, sorted by series and maturity"""
+    import pandas as pd
+    frame = pd.DataFrame.from_records(rows, columns=COLUMNS)
+    frame['maturity_date'] = pd.to_datetime(frame['maturity_date'])
+    frame = frame.astype({'principal': 'int64', 'coupon_rate': 'float64', 'yield_rate': 'float64',
+                          'term': 'bool', 'preliminary': 'bool'})
+    return frame.sort_values(['source_file', 'series', 'maturity_date'], ignore_index=True)
+
+
+def load_schedules(path=OUTPUT_FILE):
+    """Maturity rows saved by this script, as one DataFrame"""
+    import pandas as pd
+    return pd.read_parquet(path)
+
+
+def schedule_arrays(frame):
+    """{(source_file, series): {column: numpy array}}, each in maturity order"""
+    return {key: {column: group[column].to_numpy() for column in COLUMNS[2:]}
+            for key, group in frame.sort_values('maturity_date').groupby(['source_file', 'series'], sort=True)}
+
+
+def outstanding_balances(frame, as_of):
+    """{(source_file, series): principal maturing after as_of}, as scheduled at issue
+
+    Preliminary statements are left out, and so are later refundings and
+    prepayments, which only the ACFRs record.
+    """
+    import pandas as pd
+    as_of = pd.Timestamp(as_of).to_datetime64()
+    return {key: int(arrays['principal'][arrays['maturity_date'] > as_of].sum())
+            for key, arrays in schedule_arrays(frame[~frame['preliminary']]).items()}
+
+
+def main():
+    args = sys.argv[1:]
+    workers = output_file = None
+    as_of = date.today()
+    if '--workers' in args:
+        i = args.index('--workers')
+        workers = int(args[i + 1])
+        del args[i:i + 2]
+    if '--output' in args:
+        i = args.index('--output')
+        output_file = Path(args[i + 1])
+        del args[i:i + 2]
+    if '--as-of' in args:
+        i = args.index('--as-of')
+        as_of = date.fromisoformat(args[i + 1])
+        del args[i:i + 2]
+    pdf_files = [Path(arg) for arg in args] or sorted(SCRIPT_DIR.glob("*.pdf"))
+    output_file = output_file or OUTPUT_FILE
+
+    print(f"🔍 Reading maturity schedules from {len(pdf_files)} COP official statements")
+    rows = []
+    for pdf_path, (schedule, par) in extract_schedules(pdf_files, workers).items():
+        if not schedule:
+            print(f"  📄 {pdf_path.name}: no maturity schedule")
+            continue
+        rows += schedule
+        for series in dict.fromkeys(row['series'] for row in schedule):
+            total = sum(row['principal'] for row in schedule if row['series'] == series)
+            count = sum(1 for row in schedule if row['series'] == series)
+            matches = par.get(series) == total
+            print(f"  {'✅' if matches else '⚠️ '} {pdf_path.name} Series {series}: {count} maturities, ${total:,}"
+                  + ('' if matches else f" (par ${par[series]:,.0f})" if series in par else ' (no par amount)')
+                  + (' [preliminary]' if schedule[0]['preliminary'] else ''))
+
+    if not rows:
+        print("❌ No maturity schedules found")
+        return
+    try:
+        frame = schedules_frame(rows)
+        frame.to_parquet(output_file, index=False)
+    except ImportError:
+        print("⚠️  Install pandas and pyarrow to save the schedules: pip install pandas pyarrow")
+        return
+
+    print(f"\n🎉 {len(frame)} maturities saved to {output_file}")
+    balances = outstanding_balances(frame, as_of)
+    print(f"   Outstanding as scheduled on {as_of}: ${sum(balances.values()):,} across {len(balances)} series")
+    for (source_file, series), balance in balances.items():
+        print(f"     {source_file} Series {series}: ${balance:,}")
+
+
+if __name__ == "__main__":
+    main()
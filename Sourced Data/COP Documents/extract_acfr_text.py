@@ -7,8 +7,14 @@ Extracts COP-related sections from large ACFR PDFs for analysis
 import os
 import sys
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
 try:
     import PyPDF2
     import pdfplumber
@@ -18,8 +24,124 @@ except ImportError:
     import PyPDF2
     import pdfplumber
 
-def extract_cop_sections_pdfplumber(pdf_path):
-    """Extract COP-related text using pdfplumber (better for tables)"""
+from keyword_matcher import KeywordMatcher
+from pdf_page_cache import connect, file_hash, get_pages, put_pages
+from pdf_tables import save_tables, table_records
+
+# Pages handed to each worker process in extract_cop_sections_pdfplumber
+PAGE_CHUNK = 25
+
+# With --low-memory: pages per window, each read by a fresh worker process
+LOW_MEMORY_CHUNK = 10
+
+# Cache keys for the two extraction stages (library versions are part of the key)
+PREFILTER_EXTRACTOR = f"pypdf2-{PyPDF2.__version__}"
+LAYOUT_EXTRACTOR = f"pdfplumber-{pdfplumber.__version__}:text+tables"
+
+def _squash(text):
+    """Lowercase and drop all whitespace, so PyPDF2's spacing quirks don't hide a keyword"""
+    return re.sub(r'\s+', '', text.lower())
+
+def pypdf2_pages(pdf_path, page_numbers):
+    """Cheap first pass: PyPDF2 text for the given pages (None where PyPDF2 fails)"""
+    pages = {}
+    reader = PyPDF2.PdfReader(str(pdf_path))
+    for page_num in page_numbers:
+        try:
+            pages[page_num] = (reader.pages[page_num - 1].extract_text() or '', None)
+        except Exception:
+            pages[page_num] = (None, None)
+    return pages
+
+def pdfplumber_pages(pdf_path, page_numbers):
+    """Text and tables for the given pages in a worker with its own PDF handle
+
+    Each page's parsed layout objects are dropped as soon as its text and
+    tables are read, so memory follows the largest page, not the chunk.
+    """
+    pages = {}
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_num in page_numbers:
+            page = pdf.pages[page_num - 1]
+            pages[page_num] = (page.extract_text() or '', page.extract_tables())
+            page.close()
+    return pages
+
+def peak_rss_mb():
+    """(this process, largest finished worker) peak resident memory in MB, or None"""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return tuple(resource.getrusage(who).ru_maxrss / scale for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+
+class _FreshWorkerPool:
+    """Runs each task in its own single-use worker process, one task at a time
+
+    Stands in for ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1),
+    which needs Python 3.11. Each task finishes at submit.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fn, *args):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(fn, *args)
+        return future
+
+def _worker_pool(workers=None, low_memory=False):
+    """Process pool for the extraction stages; low_memory gets a fresh worker per task"""
+    if not low_memory:
+        return ProcessPoolExecutor(max_workers=workers)
+    if sys.version_info >= (3, 11):
+        return ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1)
+    return _FreshWorkerPool()
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def cached_extract_many(executor, cache, extractor, worker, documents, chunk=PAGE_CHUNK):
+    """{pdf_path: (pages, pages parsed)} for {pdf_path: (digest, page_numbers)}
+
+    Every document's uncached pages are submitted before any result is
+    awaited, so a folder of small PDFs is read side by side rather than one
+    file at a time.
+    """
+    results, futures = {}, []
+    for pdf_path, (digest, page_numbers) in documents.items():
+        pages = get_pages(cache, digest, extractor, page_numbers)
+        missing = [page_num for page_num in page_numbers if page_num not in pages]
+        results[pdf_path] = (pages, len(missing))
+        futures += [(pages, digest, executor.submit(worker, pdf_path, pages_chunk))
+                    for pages_chunk in _chunks(missing, chunk)]
+    for pages, digest, future in futures:
+        extracted = future.result()
+        put_pages(cache, digest, extractor, extracted)
+        pages.update(extracted)
+    return results
+
+def _cached_extract(executor, cache, pdf_path, digest, extractor, worker, page_numbers, chunk=PAGE_CHUNK):
+    """Pages from the cache, extracting (in parallel) and storing the ones it lacks"""
+    return cached_extract_many(executor, cache, extractor, worker, {pdf_path: (digest, page_numbers)}, chunk)[pdf_path]
+
+def extract_cop_sections_pdfplumber(pdf_path, workers=None, tables=None, low_memory=False):
+    """Extract COP-related text using pdfplumber (better for tables)
+
+    Two stages, both run over page chunks in a process pool: PyPDF2 text
+    flags candidate pages by keyword, then only those pages go through
+    pdfplumber's layout engine. Both stages read and fill the per-page cache
+    in pdf_page_cache.sqlite, so unchanged PDFs are never parsed twice.
+    The tables on COP pages are appended to the tables list, if given, as
+    typed cell records (see pdf_tables.py).
+
+    low_memory reads LOW_MEMORY_CHUNK pages at a time in a single worker
+    that is replaced after every window, so pdfminer's per-document object
+    cache never outlives a window and only one document is open at once.
+    """
     print(f"Processing {pdf_path} with pdfplumber...")
     
     cop_content = []
@@ -29,40 +151,59 @@ def extract_cop_sections_pdfplumber(pdf_path):
         'outstanding debt', 'principal amount', 'interest rate',
         'maturity date', 'annual debt service', 'debt burden'
     ]
+    matcher = KeywordMatcher(keywords)
+    squashed = KeywordMatcher(_squash(keyword) for keyword in keywords)
     
     try:
+        digest = file_hash(pdf_path)
+        cache = connect()
         with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages, 1):
-                text = page.extract_text()
-                if not text:
-                    continue
-                    
-                # Check if page contains COP-related content
-                text_lower = text.lower()
-                if any(keyword in text_lower for keyword in keywords):
-                    cop_content.append(f"\n--- PAGE {page_num} ---\n")
-                    cop_content.append(text)
-                    
-                    # Try to extract tables on this page
-                    tables = page.extract_tables()
-                    if tables:
-                        for i, table in enumerate(tables):
-                            cop_content.append(f"\n--- TABLE {i+1} ON PAGE {page_num} ---\n")
-                            for row in table:
-                                if row:
-                                    cop_content.append("\t".join([str(cell) if cell else "" for cell in row]))
-                                    cop_content.append("\n")
-                    
-                print(f"Processed page {page_num}/{len(pdf.pages)}", end='\r')
-                
+            page_count = len(pdf.pages)
+
+        chunk = LOW_MEMORY_CHUNK if low_memory else PAGE_CHUNK
+        with _worker_pool(workers, low_memory) as executor:
+            raw, parsed = _cached_extract(executor, cache, pdf_path, digest, PREFILTER_EXTRACTOR,
+                                          pypdf2_pages, list(range(1, page_count + 1)), chunk)
+            # Pages PyPDF2 could not read are left for pdfplumber to decide
+            candidates = [page_num for page_num in sorted(raw)
+                          if raw[page_num][0] is None or squashed.matches(_squash(raw[page_num][0]))]
+            print(f"{len(candidates)} of {page_count} pages mention COP keywords ({parsed} pages read with PyPDF2)")
+
+            layout, parsed = _cached_extract(executor, cache, pdf_path, digest, LAYOUT_EXTRACTOR,
+                                             pdfplumber_pages, candidates, chunk)
+            print(f"{parsed} pages read with pdfplumber, {len(candidates) - parsed} from cache")
+        cache.close()
+        peak = peak_rss_mb()
+        if peak:
+            print(f"Peak memory: {peak[0]:.0f} MB in this process, {peak[1]:.0f} MB in the largest worker")
+
+        for page_num in candidates:
+            text, page_tables = layout[page_num]
+            if not text:
+                continue
+
+            # Check if page contains COP-related content
+            if matcher.matches(text):
+                cop_content.append(f"\n--- PAGE {page_num} ---\n")
+                cop_content.append(text)
+
+                if tables is not None:
+                    for i, table in enumerate(page_tables or [], 1):
+                        tables.extend(table_records(table, page_num, i, Path(pdf_path).name))
+
     except Exception as e:
         print(f"Error with pdfplumber: {e}")
         return None
         
     return "\n".join(cop_content) if cop_content else None
 
-def extract_cop_sections_pypdf2(pdf_path):
-    """Fallback extraction using PyPDF2"""
+def extract_cop_sections_pypdf2(pdf_path, workers=None, low_memory=False):
+    """Fallback extraction using PyPDF2
+
+    Pages are read and cached like the first stage of the pdfplumber path,
+    under the same extractor key, so a fallback after that stage parses
+    nothing again.
+    """
     print(f"Processing {pdf_path} with PyPDF2...")
     
     cop_content = []
@@ -70,27 +211,27 @@ def extract_cop_sections_pypdf2(pdf_path):
         'certificate of participation', 'certificates of participation',
         'long-term debt', 'long term debt', 'debt service'
     ]
+    matcher = KeywordMatcher(keywords)
     
     try:
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            
-            for page_num, page in enumerate(pdf_reader.pages, 1):
-                try:
-                    text = page.extract_text()
-                    if not text:
-                        continue
-                        
-                    text_lower = text.lower()
-                    if any(keyword in text_lower for keyword in keywords):
-                        cop_content.append(f"\n--- PAGE {page_num} ---\n")
-                        cop_content.append(text)
-                        
-                    print(f"Processed page {page_num}/{len(pdf_reader.pages)}", end='\r')
-                    
-                except Exception as page_error:
-                    print(f"Error on page {page_num}: {page_error}")
-                    continue
+        digest = file_hash(pdf_path)
+        cache = connect()
+        page_count = len(PyPDF2.PdfReader(str(pdf_path)).pages)
+        chunk = LOW_MEMORY_CHUNK if low_memory else PAGE_CHUNK
+        with _worker_pool(workers, low_memory) as executor:
+            pages, parsed = _cached_extract(executor, cache, pdf_path, digest, PREFILTER_EXTRACTOR,
+                                            pypdf2_pages, list(range(1, page_count + 1)), chunk)
+        cache.close()
+        print(f"{parsed} pages read with PyPDF2, {page_count - parsed} from cache")
+
+        for page_num in sorted(pages):
+            text = pages[page_num][0]
+            if text is None:
+                print(f"Error on page {page_num}: PyPDF2 could not read it")
+                continue
+            if text and matcher.matches(text):
+                cop_content.append(f"\n--- PAGE {page_num} ---\n")
+                cop_content.append(text)
                     
     except Exception as e:
         print(f"Error with PyPDF2: {e}")
@@ -98,7 +239,7 @@ def extract_cop_sections_pypdf2(pdf_path):
         
     return "\n".join(cop_content) if cop_content else None
 
-def process_acfr_file(pdf_path, output_dir):
+def process_acfr_file(pdf_path, output_dir, low_memory=False):
     """Process a single ACFR file"""
     pdf_path = Path(pdf_path)
     if not pdf_path.exists():
@@ -109,12 +250,13 @@ def process_acfr_file(pdf_path, output_dir):
     print(f"File size: {pdf_path.stat().st_size / (1024*1024):.1f} MB")
     
     # Try pdfplumber first (better for tables)
-    extracted_text = extract_cop_sections_pdfplumber(pdf_path)
+    tables = []
+    extracted_text = extract_cop_sections_pdfplumber(pdf_path, tables=tables, low_memory=low_memory)
     
     # Fallback to PyPDF2 if needed
     if not extracted_text:
         print("Trying PyPDF2 fallback...")
-        extracted_text = extract_cop_sections_pypdf2(pdf_path)
+        extracted_text = extract_cop_sections_pypdf2(pdf_path, low_memory=low_memory)
     
     if not extracted_text:
         print("❌ No COP-related content found")
@@ -129,25 +271,34 @@ def process_acfr_file(pdf_path, output_dir):
         f.write(extracted_text)
     
     print(f"✅ Extracted content saved to: {output_file}")
+
+    if tables:
+        tables_file = save_tables(tables, Path(output_dir) / f"{pdf_path.stem}_COP_tables.parquet")
+        print(f"✅ {len(tables)} table cells saved to: {tables_file}")
+        if tables_file.suffix == '.json':
+            print("⚠️  pandas/pyarrow not installed, so the tables were saved as JSON "
+                  "(pip install pandas pyarrow for parquet)")
     return True
 
 def main():
-    if len(sys.argv) < 2:
+    args = [arg for arg in sys.argv[1:] if arg != '--low-memory']
+    low_memory = len(args) < len(sys.argv) - 1
+    if not args:
         print("Usage:")
-        print("  python extract_acfr_text.py <pdf_file>")
-        print("  python extract_acfr_text.py <directory_with_pdfs>")
+        print("  python extract_acfr_text.py <pdf_file> [--low-memory]")
+        print("  python extract_acfr_text.py <directory_with_pdfs> [--low-memory]")
         print("\nExample:")
         print("  python extract_acfr_text.py FY24_ACFR.pdf")
-        print("  python extract_acfr_text.py ./acfr_files/")
+        print("  python extract_acfr_text.py ./acfr_files/ --low-memory")
         return
     
-    input_path = Path(sys.argv[1])
+    input_path = Path(args[0])
     output_dir = Path("./extracted_cop_content")
     output_dir.mkdir(exist_ok=True)
     
     if input_path.is_file():
         # Process single file
-        process_acfr_file(input_path, output_dir)
+        process_acfr_file(input_path, output_dir, low_memory)
     elif input_path.is_dir():
         # Process all PDFs in directory
         pdf_files = list(input_path.glob("*.pdf"))
@@ -157,7 +308,7 @@ def main():
         
         print(f"Found {len(pdf_files)} PDF files")
         for pdf_file in pdf_files:
-            process_acfr_file(pdf_file, output_dir)
+            process_acfr_file(pdf_file, output_dir, low_memory)
     else:
         print(f"Invalid path: {input_path}")
         return
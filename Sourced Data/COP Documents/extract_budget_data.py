@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+DPS Budget PDF Extraction
+Builds public/dps_budget_data.json from the budget PDFs in Sourced Data/Budgets.
+The line items come from the Colorado Uniform Budget Summary filings (one per
+adopted or amended budget, FY2014-15 onwards). Budget books and board
+presentations are scanned too but carry no fund-by-program table, so they
+are only reported.
+
+Every PDF goes through the same two cached stages as extract_acfr_text.py:
+PyPDF2 text picks out the summary pages, then pdfplumber reads their
+tables. All documents are submitted to one process pool, so the folder is
+read side by side, and both stages are cached in pdf_page_cache.sqlite.
+Filings on the state form are first read through the templates in
+uniform_budget_summary.py, which crop the known cells instead of detecting
+tables; a filing no template fits is parsed from its tables and teaches a
+new template. --no-templates reads every filing from its tables.
+
+Usage:
+  python extract_budget_data.py [budget_dir] [--workers N] [--output FILE] [--no-templates]
+"""
+
+import json
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from extract_acfr_text import (LAYOUT_EXTRACTOR, PREFILTER_EXTRACTOR, PyPDF2, _squash,
+                               cached_extract_many, pdfplumber_pages, pypdf2_pages)
+from pdf_page_cache import connect, file_hash, get_pages, get_templates, put_template
+from uniform_budget_summary import (BOND_REDEMPTION_FUND, GENERAL_FUND, LINE_ITEMS, TEMPLATE_KIND,
+                                    extract_with_templates, learn_template, parse_uniform_budget_summary)
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+BUDGET_DIR = SCRIPT_DIR.parent / "Budgets"
+PUBLIC_DIR = SCRIPT_DIR.parent.parent / "public"
+OUTPUT_FILE = PUBLIC_DIR / "dps_budget_data.json"
+
+# Any of these (whitespace removed) marks a page of a Uniform Budget Summary
+SUMMARY_MARKERS = ['totalsupportingservices', 'totalexpenditures', 'budgetedpupilcount', 'bondredemption']
+
+# Only the state form itself has this header field, so only these filings try the templates
+FORM_MARKER = 'budgetedpupilcount'
+
+
+def _table_summaries(executor, cache, candidates):
+    """({pdf_path: summary or None}, pages parsed) through pdfplumber's table detection"""
+    layout = cached_extract_many(executor, cache, LAYOUT_EXTRACTOR, pdfplumber_pages, candidates)
+    summaries = {pdf_path: parse_uniform_budget_summary(pages) for pdf_path, (pages, _) in layout.items()}
+    return summaries, sum(count for _, count in layout.values())
+
+
+def extract_documents(pdf_files, workers=None, use_templates=True):
+    """{pdf_path: summary or None} for every budget PDF, read in one process pool"""
+    cache = connect()
+    documents = {}
+    for pdf_path in pdf_files:
+        page_count = len(PyPDF2.PdfReader(str(pdf_path)).pages)
+        documents[pdf_path] = (file_hash(pdf_path), list(range(1, page_count + 1)))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        raw = cached_extract_many(executor, cache, PREFILTER_EXTRACTOR, pypdf2_pages, documents)
+        texts, candidates = {}, {}
+        for pdf_path, (pages, _) in raw.items():
+            texts[pdf_path] = '\n'.join(text or '' for _, (text, _) in sorted(pages.items()))
+            squashed = {page_num: _squash(text) if text is not None else None for page_num, (text, _) in pages.items()}
+            # Pages PyPDF2 could not read are left for pdfplumber to decide
+            candidates[pdf_path] = (documents[pdf_path][0], [
+                page_num for page_num in sorted(squashed)
+                if squashed[page_num] is None or any(marker in squashed[page_num] for marker in SUMMARY_MARKERS)
+            ])
+
+        forms = []
+        for pdf_path in pdf_files:
+            digest, page_numbers = candidates[pdf_path]
+            # Filings whose table pages are already cached are quicker to re-read from there
+            if (use_templates and FORM_MARKER in _squash(texts[pdf_path])
+                    and len(get_pages(cache, digest, LAYOUT_EXTRACTOR, page_numbers)) < len(page_numbers)):
+                forms.append(pdf_path)
+        templates = get_templates(cache, TEMPLATE_KIND)
+        summaries, learned, table_pages = {}, 0, 0
+        pending = forms
+        while pending:
+            futures = {pdf_path: executor.submit(extract_with_templates, pdf_path, templates, texts[pdf_path])
+                       for pdf_path in pending}
+            summaries.update((pdf_path, future.result()) for pdf_path, future in futures.items())
+            misses = [pdf_path for pdf_path in pending if summaries[pdf_path] is None]
+            pending = []
+            # Parse misses from their tables until one teaches a template, then retry the rest with it
+            for i, pdf_path in enumerate(misses):
+                table, parsed = _table_summaries(executor, cache, {pdf_path: candidates[pdf_path]})
+                summaries.update(table)
+                table_pages += parsed
+                template = learn_template(pdf_path, table[pdf_path]) if table[pdf_path] else None
+                if template:
+                    put_template(cache, TEMPLATE_KIND, *template)
+                    templates[template[0]] = template[1]
+                    learned += 1
+                    pending = misses[i + 1:]
+                    break
+
+        table, parsed = _table_summaries(executor, cache, {pdf_path: candidates[pdf_path]
+                                                           for pdf_path in pdf_files if pdf_path not in forms})
+        summaries.update(table)
+        table_pages += parsed
+    cache.close()
+
+    templated = sum(1 for summary in summaries.values() if summary and 'template' in summary)
+    print(f"{sum(count for _, count in raw.values())} pages read with PyPDF2, "
+          f"{table_pages} through pdfplumber table detection (the rest from cache)")
+    print(f"{templated} filings read through templates ({learned} learned this run)")
+    return {pdf_path: summaries[pdf_path] for pdf_path in pdf_files}
+
+
+def load_enrollment(public_dir=PUBLIC_DIR):
+    """{fiscal start year: Denver County 1 October enrollment} from district_data_complete.json"""
+    path = public_dir / "district_data_complete.json"
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        trends = json.load(f).get('Denver County 1', {}).get('enrollment_trends', [])
+    return {int(entry['year']): entry['enrollment'] for entry in trends if entry.get('enrollment')}
+
+
+def load_chronic_absenteeism(public_dir=PUBLIC_DIR):
+    """{fiscal start year: average school chronic absenteeism %} from dps_schools_data_multi_year.json"""
+    path = public_dir / "dps_schools_data_multi_year.json"
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        schools = json.load(f).get('schools', [])
+    rates = {}
+    for school in schools:
+        for school_year, attendance in (school.get('attendance') or {}).items():
+            if isinstance(attendance, dict) and attendance.get('chronicAbsentRate') is not None:
+                rates.setdefault(int(school_year[:4]), []).append(attendance['chronicAbsentRate'])
+    return {year: round(sum(values) / len(values) * 100, 1) for year, values in rates.items()}
+
+
+def budget_type(pdf_path):
+    """'amended' or 'adopted', from the file name (the forms' own labels are unreliable)"""
+    return 'amended' if re.search(r'amended|revised', pdf_path.name, re.IGNORECASE) else 'adopted'
+
+
+def build_budget_data(summaries, enrollment, chronic):
+    """The dps_budget_data.json structure, one year per fiscal start year (amended over adopted)"""
+    chosen = {}
+    for pdf_path, summary in sorted(summaries.items()):
+        if not summary or summary['fiscalYear'] is None or 'totalBudget' not in summary['lineItems']:
+            continue
+        year = summary['fiscalYear']
+        if year not in chosen or budget_type(pdf_path) == 'amended':
+            chosen[year] = (pdf_path, summary)
+
+    years = {}
+    for year, (pdf_path, summary) in sorted(chosen.items()):
+        items = summary['lineItems']
+        total = lambda field: round(items[field]['TOTAL']) if field in items else None
+        general_fund = items['totalBudget'].get(GENERAL_FUND)
+        pupils = summary['budgetedPupilCount'] or enrollment.get(year)
+        years[str(year)] = {
+            'fileName': pdf_path.name,
+            'budgetType': budget_type(pdf_path),
+            'totalBudget': total('totalBudget'),
+            'instructionalSpending': total('instructionalSpending'),
+            'supportServices': total('supportServices'),
+            'capitalProjects': total('capitalProjects'),
+            'debtService': round(items['totalBudget'].get(BOND_REDEMPTION_FUND, 0)),
+            'generalFundExpenditures': round(general_fund) if general_fund is not None else None,
+            'totalRevenues': total('totalRevenues'),
+            # Budgeted counts are fractional FTE; written whole, like enrollment
+            'pupilCount': int(round(pupils)) if pupils else None,
+            'pupilCountSource': 'budgeted' if summary['budgetedPupilCount'] else 'enrollment',
+            'perPupilSpending': round(general_fund / pupils) if general_fund and pupils else None,
+        }
+
+    correlation = [
+        {
+            'year': f"{year}-{int(year) + 1}",
+            'perPupilSpending': data['perPupilSpending'],
+            'avgChronicAbsenteeism': chronic[int(year)],
+            'totalBudget': data['totalBudget'],
+            'instructionalPercent': round(data['instructionalSpending'] / data['totalBudget'] * 100, 1)
+            if data['instructionalSpending'] and data['totalBudget'] else None,
+        }
+        for year, data in years.items()
+        if int(year) in chronic and data['perPupilSpending']
+    ]
+
+    summary = {'message': 'No budget summaries found'}
+    if years:
+        first, last = years[min(years)], years[max(years)]
+        increase = last['totalBudget'] - first['totalBudget']
+        summary = {
+            'message': f"Total budget went from ${first['totalBudget'] / 1e9:.2f}B in FY{min(years)} "
+                       f"to ${last['totalBudget'] / 1e9:.2f}B in FY{max(years)}",
+            'totalIncrease': increase,
+            'percentIncrease': round(increase / first['totalBudget'] * 100, 1),
+            'absenteeismIncrease': round(correlation[-1]['avgChronicAbsenteeism'] -
+                                         correlation[0]['avgChronicAbsenteeism'], 1)
+            if len(correlation) > 1 else None,
+        }
+    return {'years': years, 'correlation': correlation, 'summary': summary}
+
+
+def main():
+    args = sys.argv[1:]
+    workers = output_file = None
+    use_templates = '--no-templates' not in args
+    args = [arg for arg in args if arg != '--no-templates']
+    if '--workers' in args:
+        i = args.index('--workers')
+        workers = int(args[i + 1])
+        del args[i:i + 2]
+    if '--output' in args:
+        i = args.index('--output')
+        output_file = Path(args[i + 1])
+        del args[i:i + 2]
+    budget_dir = Path(args[0]) if args else BUDGET_DIR
+    output_file = output_file or OUTPUT_FILE
+
+    pdf_files = sorted(budget_dir.glob("*.pdf"))
+    if not pdf_files:
+        print(f"❌ No PDF files found in {budget_dir}")
+        return
+
+    print(f"🔍 Reading {len(pdf_files)} budget PDFs from {budget_dir}")
+    summaries = extract_documents(pdf_files, workers, use_templates)
+    for pdf_path, summary in summaries.items():
+        if summary is None:
+            print(f"  📄 {pdf_path.name}: no Uniform Budget Summary table")
+            continue
+        items = summary['lineItems']
+        total = items.get('totalBudget', {}).get('TOTAL')
+        print(f"  ✅ {pdf_path.name}: FY{summary['fiscalYear']} {budget_type(pdf_path)}, "
+              f"{len(items)}/{len(LINE_ITEMS)} line items" + (f", total ${total:,.0f}" if total else '') +
+              (f" (template {summary['template']})" if 'template' in summary else ''))
+
+    budget_data = build_budget_data(summaries, load_enrollment(), load_chronic_absenteeism())
+    with open(output_file, 'w') as f:
+        json.dump(budget_data, f, indent=2)
+
+    print(f"\n🎉 {len(budget_data['years'])} fiscal years written to {output_file}")
+    print(f"   {budget_data['summary']['message']}")
+    if len(budget_data['correlation']) < 2:
+        print("⚠️  Chronic absenteeism is only available for "
+              f"{len(budget_data['correlation'])} budget year(s); the correlation chart will be sparse")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Multi-keyword matcher shared by the COP extractors
+Finds every occurrence of a fixed keyword list (case-insensitive) and
+reports (offset, keyword) hits. By default each keyword is located with
+str.find, one scan of the text per keyword.
+
+Matching every keyword in one pass was tried and dropped on purpose:
+str.find runs in C and is faster than any one-pass option available here.
+On the 10M characters of cached ACFR and COP text, with the 11 extractor
+keywords, the benchmark below measured str.find 248ms, a pyahocorasick
+automaton 331ms, a compiled regex (a lookahead alternation, so overlapping
+hits are kept, retried at every offset) 900ms, and a pure-Python
+Aho-Corasick automaton about 2.9s. The pyahocorasick and regex backends
+give the same hits and stay available (backend=...) for benchmarking.
+
+Usage:
+  python keyword_matcher.py [text_file ...]   # benchmark on full ACFR text
+"""
+
+import re
+import sys
+import timeit
+from pathlib import Path
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+from pdf_page_cache import connect
+
+EXTRACTED_DIR = Path(__file__).resolve().parent / "extracted_cop_content"
+
+BACKENDS = ('pyahocorasick', 'regex', 'str.find')
+
+
+class KeywordMatcher:
+    """Case-insensitive search for a fixed set of keywords"""
+
+    def __init__(self, keywords, backend=None):
+        self.keywords = list(dict.fromkeys(keyword.lower() for keyword in keywords))
+        if backend is None:
+            backend = 'str.find'
+        if backend not in BACKENDS or (backend == 'pyahocorasick' and ahocorasick is None):
+            raise ValueError(f"Unavailable keyword matcher backend: {backend}")
+        self.backend = backend
+        if backend == 'pyahocorasick':
+            self._automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+        elif backend == 'regex':
+            # Longest first, so each position reports its longest keyword; the
+            # shorter keywords that are its prefixes matched there too
+            alternation = '|'.join(re.escape(k) for k in sorted(self.keywords, key=len, reverse=True))
+            self._pattern = re.compile(f"(?=({alternation}))")
+            self._prefixes = {keyword: [other for other in self.keywords if other != keyword and keyword.startswith(other)]
+                              for keyword in self.keywords}
+
+    def _hits(self, text):
+        """Unordered (start, keyword) hits in already-lowercased text"""
+        if self.backend == 'pyahocorasick':
+            return [(end - len(keyword) + 1, keyword) for end, keyword in self._automaton.iter(text)]
+        hits = []
+        if self.backend == 'regex':
+            for match in self._pattern.finditer(text):
+                start, keyword = match.start(), match.group(1)
+                hits.append((start, keyword))
+                hits.extend((start, prefix) for prefix in self._prefixes[keyword])
+            return hits
+        for keyword in self.keywords:
+            start = text.find(keyword)
+            while start != -1:
+                hits.append((start, keyword))
+                start = text.find(keyword, start + 1)
+        return hits
+
+    def findall(self, text):
+        """Every (start, keyword) hit, overlapping ones included, ordered by offset
+
+        Offsets index text.lower(), which has the same length as text for
+        anything but a few non-ASCII letters.
+        """
+        return sorted(self._hits(text.lower()))
+
+    def matches(self, text):
+        """True if any keyword occurs in text"""
+        text = text.lower()
+        if self.backend == 'pyahocorasick':
+            return next(self._automaton.iter(text), None) is not None
+        if self.backend == 'regex':
+            return self._pattern.search(text) is not None
+        return any(keyword in text for keyword in self.keywords)
+
+    def matching_lines(self, text):
+        """Sorted 0-based numbers of the lines (split on '\\n') that contain a keyword"""
+        text = text.lower()
+        lines = []
+        line, position = 0, 0
+        for start, _ in sorted(self._hits(text)):
+            line += text.count('\n', position, start)
+            position = start
+            if not lines or lines[-1] != line:
+                lines.append(line)
+        return lines
+
+
+def benchmark_texts(paths):
+    """{label: text} for the given files, or every cached PDF plus the extracted files"""
+    if paths:
+        return {Path(p).name: Path(p).read_text(encoding='utf-8') for p in paths}
+
+    texts = {}
+    cache = connect()
+    rows = cache.execute(
+        "SELECT pdf_hash, text FROM pages WHERE extractor LIKE 'pypdf2-%' AND text IS NOT NULL ORDER BY pdf_hash, page"
+    ).fetchall()
+    cache.close()
+    for pdf_hash, text in rows:
+        key = f"full PDF {pdf_hash[:12]}"
+        texts[key] = texts.get(key, '') + text + '\n'
+    for path in sorted(EXTRACTED_DIR.glob("*_COP_extracted.txt")):
+        texts[path.name] = path.read_text(encoding='utf-8')
+    return texts
+
+
+def main():
+    # Keyword list used by extract_acfr_text.extract_cop_sections_pdfplumber
+    keywords = [
+        'certificate of participation', 'certificates of participation',
+        'long-term debt', 'long term debt', 'debt service',
+        'outstanding debt', 'principal amount', 'interest rate',
+        'maturity date', 'annual debt service', 'debt burden'
+    ]
+    texts = benchmark_texts(sys.argv[1:])
+    if not texts:
+        print("❌ Nothing to benchmark: run extract_acfr_text.py first or pass text files")
+        return
+
+    matchers = [KeywordMatcher(keywords, backend) for backend in BACKENDS
+                if backend != 'pyahocorasick' or ahocorasick is not None]
+    if ahocorasick is None:
+        print("pyahocorasick not installed, benchmarking the other backends only")
+
+    def per_line_any(text):
+        return [i for i, line in enumerate(text.split('\n')) if any(k in line.lower() for k in keywords)]
+
+    print(f"{'text':<60} {'chars':>9} {'any() per line':>15}" +
+          ''.join(f" {m.backend:>14}" for m in matchers))
+    totals = [0.0] * (len(matchers) + 1)
+    for label, text in texts.items():
+        expected = per_line_any(text)
+        timings = [min(timeit.repeat(lambda: per_line_any(text), number=1, repeat=5))]
+        for matcher in matchers:
+            if matcher.matching_lines(text) != expected:
+                print(f"❌ {matcher.backend} disagrees with any() on {label}")
+            timings.append(min(timeit.repeat(lambda: matcher.matching_lines(text), number=1, repeat=5)))
+        totals = [total + t for total, t in zip(totals, timings)]
+        print(f"{label[:60]:<60} {len(text):>9,} " + ' '.join(f"{t * 1000:>13.1f}ms" for t in timings))
+    print(f"{'total':<60} {sum(len(t) for t in texts.values()):>9,} " +
+          ' '.join(f"{t * 1000:>13.1f}ms" for t in totals))
+
+
+if __name__ == "__main__":
+    main()
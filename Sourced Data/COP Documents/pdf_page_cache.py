@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Per-page PDF extraction cache
+Stores extracted page text (and tables) in a local SQLite file, keyed on the
+PDF's content hash, the page number and the extractor settings. Extractors
+look pages up here before opening the PDF, so re-running with a different
+keyword list or regex only re-reads the cache. Fixed-form layouts learned
+from one PDF (cell positions, not content) are kept in the same file.
+
+Usage:
+  python pdf_page_cache.py            # show what is cached
+  python pdf_page_cache.py --clear    # drop every cached page
+"""
+
+import hashlib
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+CACHE_DB = Path(__file__).resolve().parent / "pdf_page_cache.sqlite"
+
+_hashes = {}
+
+
+def file_hash(pdf_path):
+    """SHA-256 of the PDF contents (memoized per path, size and mtime)"""
+    pdf_path = Path(pdf_path)
+    stat = pdf_path.stat()
+    key = (str(pdf_path.resolve()), stat.st_size, stat.st_mtime_ns)
+    if key not in _hashes:
+        digest = hashlib.sha256()
+        with open(pdf_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        _hashes[key] = digest.hexdigest()
+    return _hashes[key]
+
+
+def connect(db_path=CACHE_DB):
+    """Open (and create if needed) the cache database"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pages (
+            pdf_hash TEXT NOT NULL,
+            extractor TEXT NOT NULL,
+            page INTEGER NOT NULL,
+            text TEXT,
+            tables TEXT,
+            PRIMARY KEY (pdf_hash, extractor, page)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS templates (
+            kind TEXT NOT NULL,
+            name TEXT NOT NULL,
+            layout TEXT NOT NULL,
+            PRIMARY KEY (kind, name)
+        )
+    """)
+    return conn
+
+
+def get_pages(conn, pdf_hash, extractor, pages=None):
+    """{page: (text, tables)} for the cached pages of one PDF and extractor"""
+    wanted = None if pages is None else set(pages)
+    query = "SELECT page, text, tables FROM pages WHERE pdf_hash = ? AND extractor = ?"
+    params = (pdf_hash, extractor)
+    if wanted:
+        # Only read rows in the requested range
+        query += " AND page BETWEEN ? AND ?"
+        params += (min(wanted), max(wanted))
+    rows = conn.execute(query, params)
+    return {
+        page: (text, json.loads(tables) if tables is not None else None)
+        for page, text, tables in rows
+        if wanted is None or page in wanted
+    }
+
+
+def put_pages(conn, pdf_hash, extractor, pages):
+    """Store {page: (text, tables)}; text or tables may be None"""
+    conn.executemany(
+        "INSERT OR REPLACE INTO pages (pdf_hash, extractor, page, text, tables) VALUES (?, ?, ?, ?, ?)",
+        [(pdf_hash, extractor, page, text, json.dumps(tables) if tables is not None else None)
+         for page, (text, tables) in pages.items()],
+    )
+    conn.commit()
+
+
+def get_templates(conn, kind):
+    """{name: layout} for every stored template of one kind, oldest first"""
+    rows = conn.execute("SELECT name, layout FROM templates WHERE kind = ? ORDER BY rowid", (kind,))
+    return {name: json.loads(layout) for name, layout in rows}
+
+
+def put_template(conn, kind, name, layout):
+    """Store a learned layout under (kind, name)"""
+    conn.execute("INSERT OR REPLACE INTO templates (kind, name, layout) VALUES (?, ?, ?)",
+                 (kind, name, json.dumps(layout)))
+    conn.commit()
+
+
+def main():
+    conn = connect()
+    if '--clear' in sys.argv[1:]:
+        conn.execute("DELETE FROM pages")
+        conn.execute("DELETE FROM templates")
+        conn.commit()
+        conn.execute("VACUUM")
+        print(f"✅ Cleared {CACHE_DB}")
+        return
+
+    rows = conn.execute(
+        "SELECT pdf_hash, extractor, COUNT(*) FROM pages GROUP BY pdf_hash, extractor ORDER BY pdf_hash"
+    ).fetchall()
+    print(f"📄 {CACHE_DB} ({CACHE_DB.stat().st_size / (1024 * 1024):.1f} MB)")
+    for pdf_hash, extractor, count in rows:
+        print(f"  {pdf_hash[:12]}  {extractor:<28} {count} pages")
+    for kind, count in conn.execute("SELECT kind, COUNT(*) FROM templates GROUP BY kind ORDER BY kind"):
+        print(f"  templates     {kind:<28} {count}")
+
+
+if __name__ == "__main__":
+    main()
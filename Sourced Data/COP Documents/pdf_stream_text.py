@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+Dependency-free PDF text extraction
+Memory-maps the PDF, indexes its objects (including the ones packed into
+object streams), walks the page tree and inflates each page's FlateDecode
+content streams with zlib. Strings drawn by the text operators (Tj, TJ, '
+and ") are decoded through the font's ToUnicode CMap when it has one (two
+bytes per code for Type0 fonts) and as WinAnsi (cp1252) otherwise. Text
+is yielded one page at a time. Files encrypted with the standard RC4
+handler and an empty user password, as some EMMA filings are, are
+decrypted; other encrypted files yield nothing.
+
+Usage:
+  python pdf_stream_text.py <pdf_file>   # print the text, page by page
+"""
+
+import hashlib
+import mmap
+import re
+import struct
+import sys
+import zlib
+from pathlib import Path
+
+_OBJECT = re.compile(rb'(?<![0-9])(\d+)\s+(\d+)\s+obj\b')
+_REFERENCE = re.compile(rb'(\d+)\s+(\d+)\s+R\b')
+_NAMED_REFERENCE = re.compile(rb'/([^\s/<>\[\]()]+)\s*(\d+)\s+\d+\s+R\b')
+# "stream" keyword that starts a stream's data
+_STREAM = re.compile(rb'stream(?:\r\n|\n|\r)')
+# Filters other than FlateDecode, which zlib cannot undo
+_UNSUPPORTED_FILTER = re.compile(rb'/(?:DCT|JPX|JBIG2|CCITTFax|RunLength|LZW|ASCII85|ASCIIHex|Crypt)Decode')
+# Streams with no page text, skipped when there is no page tree to follow
+_NOT_CONTENT = re.compile(
+    rb'/Subtype\s*/(?:Image|XML|Type1C|CIDFontType0C|OpenType)'
+    rb'|/Type\s*/(?:ObjStm|XRef|Metadata|EmbeddedFile)|/Length[123]\b'
+)
+
+# Content stream tokens: literal string (one level of nested parentheses),
+# hex string, dictionary delimiters, array brackets, name, number, operator
+_TOKEN = re.compile(
+    rb'\((?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*\)'
+    rb'|<<|>>|<[0-9A-Fa-f\s]*>'
+    rb'|\[|\]'
+    rb'|/[^\s/\[\]()<>{}%]*'
+    rb'|[+-]?(?:\d+\.?\d*|\.\d+)'
+    rb'|[A-Za-z\'"*][A-Za-z0-9*]*',
+    re.DOTALL,
+)
+_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f',
+            b'(': b'(', b')': b')', b'\\': b'\\'}
+_ESCAPE = re.compile(rb'\\([0-7]{1,3}|\r\n|[\s\S])')
+_INLINE_IMAGE_END = re.compile(rb'\sEI(?:\s|$)')
+# Control characters are dropped from decoded strings
+_CONTROL = dict.fromkeys(list(range(32)) + [127])
+
+# Kerning in a TJ array (thousandths of an em) wide enough to be a space
+TJ_SPACE = -250
+# Without font metrics, glyphs are taken to be GLYPH_WIDTH em wide; a move
+# more than GAP_WIDTH em past the text shown separates two words
+GLYPH_WIDTH = 0.6
+GAP_WIDTH = 0.25
+# Form XObjects drawn inside form XObjects are followed this deep
+MAX_FORM_DEPTH = 5
+# Compressed bytes handed to zlib at a time by _inflate
+INFLATE_PIECE = 1024
+
+_BFCHAR = re.compile(rb'beginbfchar(.*?)endbfchar', re.DOTALL)
+_BFRANGE = re.compile(rb'beginbfrange(.*?)endbfrange', re.DOTALL)
+_HEX = re.compile(rb'<([0-9A-Fa-f\s]*)>|\[([^\]]*)\]')
+
+# Standard security handler (PDF 1.7, 7.6.3)
+_PASSWORD_PAD = bytes.fromhex(
+    '28BF4E5E4E758A4164004E56FFFA01082E2E00B6D0683E802F0CA9FE6453697A'
+)
+
+
+def _inflate(data):
+    """zlib-inflate a stream, keeping whatever decodes before any corruption
+
+    The data is fed in INFLATE_PIECE chunks, so an error only loses the
+    output of the chunk it occurs in; a truncated stream yields all it has.
+    """
+    inflater = zlib.decompressobj()
+    pieces = []
+    try:
+        for start in range(0, len(data), INFLATE_PIECE):
+            pieces.append(inflater.decompress(data[start:start + INFLATE_PIECE]))
+        pieces.append(inflater.flush())
+    except zlib.error:
+        pass
+    return b''.join(pieces)
+
+
+def _hex_bytes(text):
+    digits = re.sub(rb'\s', b'', text)
+    if len(digits) % 2:
+        digits += b'0'
+    return bytes.fromhex(digits.decode('ascii'))
+
+
+def _literal(token):
+    """Bytes of a (literal string) token"""
+    return _ESCAPE.sub(_unescape, token[1:-1])
+
+
+def _unescape(match):
+    escaped = match.group(1)
+    if escaped[:1].isdigit():
+        return bytes([int(escaped, 8) & 0xFF])
+    if escaped in (b'\n', b'\r', b'\r\n'):
+        return b''  # line continuation
+    return _ESCAPES.get(escaped, escaped)
+
+
+def _balanced(data, start):
+    """The << dictionary >> or [ array ] that starts at data[start]"""
+    depth = 0
+    i = start
+    while i < len(data):
+        char = data[i:i + 1]
+        if data.startswith(b'<<', i) or char == b'[':
+            depth += 1
+            i += 1 if char == b'[' else 2
+        elif data.startswith(b'>>', i) or char == b']':
+            depth -= 1
+            i += 1 if char == b']' else 2
+            if depth == 0:
+                return data[start:i]
+        elif char == b'<':
+            i = data.find(b'>', i) + 1 or len(data)  # hex string
+        elif char == b'(':
+            string = _TOKEN.match(data, i)
+            i = string.end() if string else i + 1
+        else:
+            i += 1
+    return data[start:]
+
+
+def _entry(dictionary, key):
+    """Value of /key in a dictionary: a nested dictionary or array, a
+    reference ("12 0 R"), string bytes, or a name or number token"""
+    match = re.search(rb'/' + key + rb'(?![^\s/<>\[\]()])\s*', dictionary)
+    if not match:
+        return None
+    start = match.end()
+    if dictionary.startswith(b'<<', start) or dictionary.startswith(b'[', start):
+        return _balanced(dictionary, start)
+    reference = _REFERENCE.match(dictionary, start)
+    if reference:
+        return reference.group()
+    token = _TOKEN.match(dictionary, start)
+    if not token:
+        return None
+    value = token.group()
+    if value.startswith(b'('):
+        return _literal(value)
+    if value.startswith(b'<'):
+        return _hex_bytes(value[1:-1])
+    return value.lstrip(b'/')
+
+
+def _reference(value):
+    """Object number of an indirect reference value, or None"""
+    match = _REFERENCE.fullmatch(value.strip()) if value else None
+    return int(match.group(1)) if match else None
+
+
+def _rc4(key, data):
+    """RC4-encrypt or decrypt data"""
+    box = list(range(256))
+    j = 0
+    for i in range(256):
+        j = (j + box[i] + key[i % len(key)]) & 0xFF
+        box[i], box[j] = box[j], box[i]
+    out = bytearray(len(data))
+    i = j = 0
+    for n, byte in enumerate(data):
+        i = (i + 1) & 0xFF
+        j = (j + box[i]) & 0xFF
+        box[i], box[j] = box[j], box[i]
+        out[n] = byte ^ box[(box[i] + box[j]) & 0xFF]
+    return bytes(out)
+
+
+def _file_key(mm):
+    """RC4 file key for the empty user password, None if unencrypted, False if unreadable"""
+    trailer = re.search(rb'/Encrypt\s+(\d+)\s+(\d+)\s+R', mm)
+    if not trailer:
+        return None
+    start = re.search(rb'(?<![0-9])' + trailer.group(1) + rb'\s+' + trailer.group(2) + rb'\s+obj', mm)
+    file_id = re.search(rb'/ID\s*\[\s*<([0-9A-Fa-f\s]*)>', mm)
+    if not start or not file_id:
+        return False
+    encrypt = mm[start.end():mm.find(b'endobj', start.end())]
+    version, revision = int(_entry(encrypt, b'V') or 0), int(_entry(encrypt, b'R') or 0)
+    if _entry(encrypt, b'Filter') != b'Standard' or version not in (1, 2) or revision not in (2, 3):
+        return False  # AES (V4/V5) needs a cipher the standard library lacks
+
+    length = int(_entry(encrypt, b'Length') or 40) // 8 if revision == 3 else 5
+    owner, user = _entry(encrypt, b'O'), _entry(encrypt, b'U')
+    permissions = struct.pack('<i', int(_entry(encrypt, b'P')))
+    first_id = _hex_bytes(file_id.group(1))
+    key = hashlib.md5(_PASSWORD_PAD + owner + permissions + first_id).digest()[:length]
+    if revision == 3:
+        for _ in range(50):
+            key = hashlib.md5(key).digest()[:length]
+
+    # Check the key against /U, which only matches when the user password is empty
+    if revision == 2:
+        return key if user[:32] == _rc4(key, _PASSWORD_PAD) else False
+    check = _rc4(key, hashlib.md5(_PASSWORD_PAD + first_id).digest())
+    for i in range(1, 20):
+        check = _rc4(bytes(b ^ i for b in key), check)
+    return key if user[:16] == check else False
+
+
+def parse_to_unicode(cmap):
+    """{code bytes: text} from the bfchar/bfrange mappings of a ToUnicode CMap"""
+    table = {}
+    for block in _BFCHAR.findall(cmap):
+        codes = [_hex_bytes(h) for h, _ in _HEX.findall(block)]
+        for source, target in zip(codes[::2], codes[1::2]):
+            table[source] = target.decode('utf-16-be', errors='ignore')
+    for block in _BFRANGE.findall(cmap):
+        entries = _HEX.findall(block)
+        for i in range(0, len(entries) - 2, 3):
+            low, high = _hex_bytes(entries[i][0]), _hex_bytes(entries[i + 1][0])
+            hex_target, array_target = entries[i + 2]
+            width = len(low)
+            first, last = int.from_bytes(low, 'big'), int.from_bytes(high, 'big')
+            if array_target:
+                targets = [_hex_bytes(h) for h, _ in _HEX.findall(array_target)]
+                for offset, target in enumerate(targets[:last - first + 1]):
+                    table[(first + offset).to_bytes(width, 'big')] = target.decode('utf-16-be', errors='ignore')
+            else:
+                target = _hex_bytes(hex_target)
+                base = int.from_bytes(target, 'big')
+                for offset in range(min(last - first + 1, 65536)):
+                    code = (base + offset).to_bytes(len(target), 'big')
+                    table[(first + offset).to_bytes(width, 'big')] = code.decode('utf-16-be', errors='ignore')
+    return table
+
+
+def _decode(raw, font):
+    """Text for the bytes of one string operand in font (code width, ToUnicode table)"""
+    width, table = font
+    if width == 2:
+        # Identity-H codes mean nothing without a ToUnicode map
+        if not table:
+            return ''
+        return ''.join(table.get(raw[i:i + 2], '') for i in range(0, len(raw) - 1, 2)).translate(_CONTROL)
+    if table:
+        return ''.join(table.get(raw[i:i + 1]) or raw[i:i + 1].decode('cp1252', errors='ignore')
+                       for i in range(len(raw))).translate(_CONTROL)
+    return raw.decode('cp1252', errors='ignore').translate(_CONTROL)
+
+
+def _separate(pieces, separator):
+    """Append a space or newline unless the text already ends with whitespace"""
+    if pieces and not pieces[-1][-1:].isspace():
+        pieces.append(separator)
+    elif separator == '\n' and pieces and pieces[-1][-1:] == ' ':
+        pieces[-1] = pieces[-1].rstrip(' ') + '\n'
+
+
+def _word_gap(move, font_size, shown):
+    """True if a horizontal move (text space) leaves a gap after the text shown
+
+    Per-glyph or per-syllable placement moves by about the width of what was
+    just drawn; a move well past it separates two words.
+    """
+    return move > font_size * (GLYPH_WIDTH * shown + GAP_WIDTH)
+
+
+def content_text(data, fonts=None, forms=None):
+    """Text drawn by a content stream
+
+    fonts maps font resource names (b'/F1') to (code width, ToUnicode table);
+    forms, if given, returns the text of a form XObject drawn with Do.
+    """
+    fonts = fonts or {}
+    font = (1, None)
+    pieces = []
+    operands = []
+    array = None
+    font_size = 1.0
+    shown = 0  # characters shown since the last positioning operator
+    x = y = None  # start of the current line (Tm translation)
+    scale = 1.0
+    position = 0
+    while True:
+        match = _TOKEN.search(data, position)
+        if not match:
+            break
+        token = match.group()
+        position = match.end()
+        first = token[:1]
+
+        if first == b'(' or (first == b'<' and token != b'<<'):
+            raw = _literal(token) if first == b'(' else _hex_bytes(token[1:-1])
+            (array if array is not None else operands).append(_decode(raw, font))
+        elif first == b'[':
+            array = []
+        elif first == b']':
+            operands.append(array if array is not None else [])
+            array = None
+        elif first.isdigit() or first in b'+-.':
+            (array if array is not None else operands).append(float(token))
+        elif first in (b'/', b'<', b'>'):
+            operands.append(token)
+        elif token == b'ID':
+            # Inline image data runs to the next EI
+            end = _INLINE_IMAGE_END.search(data, position)
+            position = end.end() if end else len(data)
+            operands = []
+        else:
+            strings = [o for o in operands if isinstance(o, str)]
+            if token == b'Tj' and strings:
+                pieces.append(strings[-1])
+                shown += len(strings[-1])
+            elif token in (b"'", b'"') and strings:
+                _separate(pieces, '\n')
+                pieces.append(strings[-1])
+                shown = len(strings[-1])
+            elif token == b'TJ' and operands and isinstance(operands[-1], list):
+                for item in operands[-1]:
+                    if isinstance(item, str):
+                        pieces.append(item)
+                        shown += len(item)
+                    elif item <= TJ_SPACE:
+                        _separate(pieces, ' ')
+            elif token == b'Tf' and len(operands) >= 2 and isinstance(operands[-1], float):
+                font = fonts.get(operands[-2], (1, None))
+                font_size = abs(operands[-1]) or 1.0
+            elif token == b'T*':
+                _separate(pieces, '\n')
+                shown = 0
+            elif token in (b'Td', b'TD') and len(operands) >= 2:
+                if operands[-1]:
+                    _separate(pieces, '\n')
+                elif _word_gap(operands[-2], font_size, shown):
+                    _separate(pieces, ' ')
+                if x is not None:
+                    x += operands[-2] * scale
+                shown = 0
+            elif token == b'Tm' and len(operands) >= 6:
+                new_x, new_y = operands[-2], operands[-1]
+                if y is not None and new_y != y:
+                    _separate(pieces, '\n')
+                elif x is not None and _word_gap((new_x - x) / (operands[-6] or 1.0), font_size, shown):
+                    _separate(pieces, ' ')
+                x, y, scale = new_x, new_y, operands[-6] or 1.0
+                shown = 0
+            elif token == b'Do' and forms and operands:
+                text = forms(operands[-1])
+                if text:
+                    _separate(pieces, '\n')
+                    pieces.append(text)
+                    _separate(pieces, '\n')
+            operands = []
+
+    text = ''.join(pieces)
+    # Collapse the runs of blank lines and spaces left by positioning operators
+    text = re.sub(r'[ \t]*\n\s*\n', '\n', text)
+    return re.sub(r' {2,}', ' ', text)
+
+
+class PdfObjects:
+    """Object lookup over a memory-mapped PDF
+
+    Objects are located by scanning for "N G obj" rather than through the
+    xref table, so files with damaged cross-reference data still read.
+    """
+
+    def __init__(self, mm):
+        self.mm = mm
+        self.offsets = {}  # object number: (generation, offset after "obj")
+        for match in _OBJECT.finditer(mm):
+            self.offsets[int(match.group(1))] = (int(match.group(2)), match.end())
+        self.file_key = _file_key(mm)
+        self.packed = {}  # object number: body, for objects inside object streams
+        self._fonts = {}
+        if self.file_key is not False and mm.find(b'/ObjStm') != -1:
+            self._unpack_object_streams()
+
+    def _dictionary(self, number):
+        """Bytes between "obj" and "stream"/"endobj" of a top-level object"""
+        start = self.offsets[number][1]
+        end = self.mm.find(b'endobj', start)
+        end = len(self.mm) if end == -1 else end
+        stream = _STREAM.search(self.mm, start, end)
+        return self.mm[start:stream.start() if stream else end]
+
+    def body(self, number):
+        """Dictionary, array or value of an object (b'' if missing)"""
+        if number in self.offsets:
+            return self._dictionary(number).strip()
+        return self.packed.get(number, b'')
+
+    def resolve(self, value):
+        """Follow an indirect reference; other values are returned as they are"""
+        number = _reference(value)
+        return self.body(number) if number is not None else value
+
+    def stream(self, number):
+        """Decrypted, inflated data of a stream object (b'' if unreadable)"""
+        if number not in self.offsets:
+            return b''
+        generation, start = self.offsets[number]
+        match = _STREAM.search(self.mm, start)
+        if not match:
+            return b''
+        dictionary = self.mm[start:match.start()]
+        if b'endobj' in dictionary or _UNSUPPORTED_FILTER.search(dictionary):
+            return b''
+        end = self.mm.find(b'endstream', match.end())
+        data = self.mm[match.end():end if end != -1 else len(self.mm)]
+        if self.file_key:
+            key = hashlib.md5(self.file_key + struct.pack('<i', number)[:3] + struct.pack('<i', generation)[:2])
+            data = _rc4(key.digest()[:min(len(self.file_key) + 5, 16)], data)
+        if b'/FlateDecode' in dictionary or b'/Fl ' in dictionary or b'/Fl/' in dictionary:
+            data = _inflate(data)
+        return data
+
+    def _unpack_object_streams(self):
+        for number in list(self.offsets):
+            dictionary = self._dictionary(number)
+            if not re.search(rb'/Type\s*/ObjStm', dictionary):
+                continue
+            data = self.stream(number)
+            first = int(_entry(dictionary, b'First') or 0)
+            header = data[:first].split()
+            members = [(int(n), int(o)) for n, o in zip(header[::2], header[1::2])]
+            for i, (member, offset) in enumerate(members):
+                end = first + members[i + 1][1] if i + 1 < len(members) else len(data)
+                # An object written out in full (e.g. by an incremental update) wins
+                if member not in self.offsets:
+                    self.packed[member] = data[first + offset:end].strip()
+
+    def font(self, number):
+        """(code width, ToUnicode table or None) for a font object"""
+        if number not in self._fonts:
+            body = self.body(number)
+            width = 2 if re.search(rb'/Subtype\s*/Type0', body) else 1
+            to_unicode = _reference(_entry(body, b'ToUnicode'))
+            table = parse_to_unicode(self.stream(to_unicode)) if to_unicode is not None else None
+            self._fonts[number] = (width, table or None)
+        return self._fonts[number]
+
+    def _named_objects(self, resources, kind):
+        """{b'/Name': object number} from a resource dictionary's /Font or /XObject"""
+        named = self.resolve(_entry(resources, kind)) if resources else None
+        if not named:
+            return {}
+        return {b'/' + name: int(number) for name, number in _NAMED_REFERENCE.findall(named)}
+
+    def _text(self, data, resources, depth=0):
+        """Text of content stream data drawn with the given resource dictionary"""
+        fonts = {name: self.font(number) for name, number in self._named_objects(resources, b'Font').items()}
+        xobjects = self._named_objects(resources, b'XObject')
+
+        def forms(name):
+            number = xobjects.get(name)
+            if number is None or depth >= MAX_FORM_DEPTH or number not in self.offsets:
+                return None
+            dictionary = self._dictionary(number)
+            if not re.search(rb'/Subtype\s*/Form', dictionary):
+                return None
+            form_resources = self.resolve(_entry(dictionary, b'Resources')) or resources
+            return self._text(self.stream(number), form_resources, depth + 1)
+
+        return content_text(data, fonts, forms)
+
+    def pages(self):
+        """Yield (page dictionary, resources) in page order"""
+        roots = list(re.finditer(rb'/Root\s+(\d+)\s+\d+\s+R', self.mm))
+        if not roots:
+            return
+        catalog = self.body(int(roots[-1].group(1)))
+        pages = _reference(_entry(catalog, b'Pages'))
+        stack = [(pages, None)] if pages is not None else []
+        seen = set()
+        while stack:
+            number, inherited = stack.pop()
+            if number in seen:
+                continue
+            seen.add(number)
+            node = self.body(number)
+            resources = self.resolve(_entry(node, b'Resources')) or inherited
+            kids = _entry(node, b'Kids')
+            if kids is not None:
+                kids = self.resolve(kids)
+                stack.extend((int(n), resources) for n, _ in reversed(_REFERENCE.findall(kids)))
+            elif node:
+                yield node, resources
+
+    def page_text(self, page, resources):
+        """Text of one page"""
+        contents = _entry(page, b'Contents')
+        if contents is None:
+            return ''
+        number = _reference(contents)
+        if number is not None and self.body(number).startswith(b'['):
+            contents = self.body(number)
+        streams = [int(n) for n, _ in _REFERENCE.findall(contents)]
+        # A page's content streams are one stream split in pieces
+        return self._text(b'\n'.join(self.stream(n) for n in streams), resources)
+
+    def loose_text(self):
+        """Yield the text of every content-like stream in file order, for PDFs
+        whose page tree cannot be followed"""
+        for number in sorted(self.offsets, key=lambda n: self.offsets[n][1]):
+            dictionary = self._dictionary(number)
+            if not dictionary.rstrip().endswith(b'>>') or _NOT_CONTENT.search(dictionary):
+                continue
+            data = self.stream(number)
+            if b'begincmap' in data or not (b'Tj' in data or b'TJ' in data):
+                continue
+            text = content_text(data)
+            if text.strip():
+                yield text
+
+
+def iter_pdf_text(pdf_path):
+    """Yield the text of each page in page order"""
+    with open(pdf_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        objects = PdfObjects(mm)
+        if objects.file_key is False:
+            return
+        found = False
+        for page, resources in objects.pages():
+            found = True
+            yield objects.page_text(page, resources)
+        if not found:
+            yield from objects.loose_text()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python pdf_stream_text.py <pdf_file>")
+        return
+    pdf_path = Path(sys.argv[1])
+    for page_number, text in enumerate(iter_pdf_text(pdf_path), 1):
+        sys.stdout.write(f"--- Page {page_number} ---\n{text}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Typed table records for tables read out of PDFs
+Turns pdfplumber's tables (rows of cell strings) into one record per cell:
+page, table index, row and column, the text of the column's header cell,
+the cell text and its numeric value ($1,234, (1,234), 4.25% and a lone
+dash for zero all parse). Each PDF's records are stored as one parquet
+file, which analysis loads straight into a DataFrame. Without pandas and
+pyarrow they are written as a JSON list of records instead (same name,
+.json), which load_tables reads the same way.
+
+Usage:
+  python pdf_tables.py <tables.parquet|tables.json> [...]   # list the stored tables
+"""
+
+import json
+import re
+import sys
+from pathlib import Path
+
+COLUMNS = ['source_file', 'page', 'table_index', 'row', 'column', 'header', 'is_header', 'text', 'value']
+
+NUMBER = re.compile(r'-?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?|-?\.\d+')
+DASHES = ('-', '—', '–')
+
+
+def parse_number(cell):
+    """Value of a numeric cell ('$1,234.00', '(1,234)', '4.25%', '-' for zero), or None"""
+    if cell is None:
+        return None
+    # pdfplumber sometimes splits a number with spaces ('3 9,335,000')
+    text = re.sub(r'\s+', '', cell).replace('$', '')
+    if text in DASHES:
+        return 0.0
+    negative = text.startswith('(') and text.endswith(')')
+    if negative:
+        text = text[1:-1].replace('$', '')
+    text = text[:-1] if text.endswith('%') else text
+    if not NUMBER.fullmatch(text):
+        return None
+    value = float(text.replace(',', ''))
+    return -value if negative else value
+
+
+def _header_row(rows):
+    """Index of the first row that is mostly words rather than numbers, or None"""
+    for i, row in enumerate(rows):
+        cells = [cell for cell in row if cell not in (None, '')]
+        if cells and sum(parse_number(cell) is not None for cell in cells) * 2 < len(cells):
+            return i
+    return None
+
+
+def table_records(table, page, table_index, source_file=None):
+    """One record per cell of a pdfplumber table (table_index counts from 1 on each page)"""
+    header_row = _header_row(table)
+    headers = table[header_row] if header_row is not None else []
+    records = []
+    for row_index, row in enumerate(table):
+        for column, cell in enumerate(row):
+            if cell in (None, ''):
+                continue
+            header = headers[column] if column < len(headers) else None
+            records.append({
+                'source_file': source_file,
+                'page': page,
+                'table_index': table_index,
+                'row': row_index,
+                'column': column,
+                'header': ' '.join(header.split()) if header else None,
+                'is_header': row_index == header_row,
+                'text': cell,
+                'value': parse_number(cell),
+            })
+    return records
+
+
+def records_frame(records):
+    """DataFrame of table records with fixed column types"""
+    # pandas is imported here so the PDF workers, which only build records, stay small
+    import pandas as pd
+    frame = pd.DataFrame.from_records(records, columns=COLUMNS)
+    return frame.astype({'page': 'int32', 'table_index': 'int16', 'row': 'int32', 'column': 'int16',
+                         'is_header': 'bool', 'value': 'float64'})
+
+
+def save_tables(records, path):
+    """Write table records to a parquet file, or to JSON beside it without pandas/pyarrow
+
+    Returns the path written. The other format's file, left by an earlier
+    run, is removed so each PDF has one tables file.
+    """
+    path = Path(path)
+    json_path = path.with_suffix('.json')
+    try:
+        records_frame(records).to_parquet(path, index=False)
+    except ImportError:
+        path, json_path = json_path, path
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(records, f)
+    json_path.unlink(missing_ok=True)
+    return path
+
+
+def _read_tables(path):
+    import pandas as pd
+    if Path(path).suffix == '.json':
+        with open(path, encoding='utf-8') as f:
+            return records_frame(json.load(f))
+    return pd.read_parquet(path)
+
+
+def load_tables(paths):
+    """Table records from one or more parquet or JSON files, as one DataFrame"""
+    import pandas as pd
+    paths = [paths] if isinstance(paths, (str, Path)) else list(paths)
+    if not paths:
+        return records_frame([])
+    return pd.concat([_read_tables(path) for path in paths], ignore_index=True)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python pdf_tables.py <tables.parquet|tables.json> [...]")
+        return
+
+    frame = load_tables(sys.argv[1:])
+    tables = frame.groupby(['source_file', 'page', 'table_index'], sort=True)
+    print(f"📄 {tables.ngroups} tables, {len(frame)} cells, {int(frame['value'].notna().sum())} numeric")
+    for (source_file, page, table_index), cells in tables:
+        header = cells.loc[cells['is_header'], 'text'].map(lambda text: ' '.join(text.split()))
+        print(f"  {source_file} p{page} t{table_index}: {cells['row'].max() + 1} rows, "
+              f"{int(cells['value'].notna().sum())} numbers | {' | '.join(header)[:80]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Full-text search over every ACFR, COP official statement and budget PDF
+Loads the per-page PyPDF2 text of each document (Sourced Data/ACFR, this
+folder's official statements, Sourced Data/Budgets, plus any ACFRs kept
+elsewhere that are passed to --build) into a SQLite FTS5 index
+(pdf_text_index.sqlite), with its kind, year and page number. Pages come
+from pdf_page_cache.sqlite where extract_acfr_text.py or
+extract_budget_data.py already read them; the rest are extracted in a
+process pool and cached too. Re-building only touches PDFs that are new or
+whose contents changed.
+
+Queries use FTS5 syntax: words (all must appear on the page), "quoted
+phrases", OR, NOT, prefix* and NEAR(a b, N) for terms within N words.
+
+Usage:
+  python pdf_text_index.py --build [acfr_pdf_or_dir ...] [--workers N]
+  python pdf_text_index.py <query> [--kind acfr|cop|budget] [--year YYYY] [--limit N]
+  python pdf_text_index.py            # list the indexed documents
+
+Examples:
+  python pdf_text_index.py '"series 2013a" refunding'
+  python pdf_text_index.py 'NEAR("certificates of participation" "bond redemption", 20)' --kind cop
+"""
+
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from extract_acfr_text import PREFILTER_EXTRACTOR, PyPDF2, cached_extract_many, pypdf2_pages
+from pdf_page_cache import connect, file_hash
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+INDEX_DB = SCRIPT_DIR / "pdf_text_index.sqlite"
+ACFR_DIR = SCRIPT_DIR.parent / "ACFR"
+COP_DIR = SCRIPT_DIR
+BUDGET_DIR = SCRIPT_DIR.parent / "Budgets"
+
+# Year in a file name: 2014 or FY2014-15, FY14-15, or FY15 (fiscal 2014-15, so 2014)
+NAME_YEAR = re.compile(r'(?<!\d)(20\d{2})(?!\d)|FY\s*-?\s*(\d{2})(-\d{2})?(?!\d)', re.IGNORECASE)
+# Official statements are named by CUSIP, so their year is the series on the cover
+SERIES_YEAR = re.compile(r'Series\s+(\d{4})', re.IGNORECASE)
+TEXT_YEAR = re.compile(r'(?<!\d)((?:19|20)\d{2})(?!\d)')
+
+
+def connect_index(db_path=INDEX_DB):
+    """Open (and create if needed) the search index"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            name TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            year INTEGER,
+            pdf_hash TEXT NOT NULL,
+            page_count INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS page_text USING fts5(
+            text, document_id UNINDEXED, page UNINDEXED, tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """)
+    return conn
+
+
+def document_year(pdf_path, first_page):
+    """The year in the file name, else the series year (or first year) on the cover page
+
+    Budgets get their fiscal start year, as in dps_budget_data.json.
+    """
+    match = NAME_YEAR.search(Path(pdf_path).name)
+    if match and match.group(1):
+        return int(match.group(1))
+    if match:
+        return 2000 + int(match.group(2)) - (0 if match.group(3) else 1)
+    match = SERIES_YEAR.search(first_page) or TEXT_YEAR.search(first_page)
+    return int(match.group(1)) if match else None
+
+
+def _pdf_files(path):
+    path = Path(path)
+    return sorted(path.glob("*.pdf")) if path.is_dir() else [path]
+
+
+def build_index(sources, workers=None):
+    """Index {pdf_path: kind}, skipping PDFs already indexed with the same contents"""
+    index = connect_index()
+    indexed = {path: (doc_id, pdf_hash) for doc_id, path, pdf_hash
+               in index.execute("SELECT id, path, pdf_hash FROM documents")}
+
+    # Documents whose file is gone are dropped; changed ones are re-indexed below
+    for path, (doc_id, _) in indexed.items():
+        if not Path(path).exists():
+            index.execute("DELETE FROM page_text WHERE document_id = ?", (doc_id,))
+            index.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+            print(f"  🗑️  {Path(path).name} removed")
+
+    documents = {}
+    for pdf_path in sources:
+        digest = file_hash(pdf_path)
+        if indexed.get(str(pdf_path.resolve()), (None, None))[1] != digest:
+            page_count = len(PyPDF2.PdfReader(str(pdf_path)).pages)
+            documents[pdf_path] = (digest, list(range(1, page_count + 1)))
+    print(f"🔍 {len(sources)} PDFs, {len(documents)} to index")
+
+    cache = connect()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        raw = cached_extract_many(executor, cache, PREFILTER_EXTRACTOR, pypdf2_pages, documents)
+    cache.close()
+
+    for pdf_path, (pages, _) in raw.items():
+        path = str(pdf_path.resolve())
+        if path in indexed:
+            index.execute("DELETE FROM page_text WHERE document_id = ?", (indexed[path][0],))
+            index.execute("DELETE FROM documents WHERE id = ?", (indexed[path][0],))
+        year = document_year(pdf_path, pages.get(1, ('', None))[0] or '')
+        doc_id = index.execute(
+            "INSERT INTO documents (path, name, kind, year, pdf_hash, page_count) VALUES (?, ?, ?, ?, ?, ?)",
+            (path, pdf_path.name, sources[pdf_path], year, documents[pdf_path][0], len(pages)),
+        ).lastrowid
+        # Pages PyPDF2 could not read (None) are left out
+        index.executemany("INSERT INTO page_text (text, document_id, page) VALUES (?, ?, ?)",
+                          [(text, doc_id, page_num) for page_num, (text, _) in sorted(pages.items())
+                           if text and text.strip()])
+        print(f"  ✅ {pdf_path.name}: {sources[pdf_path]}, {year}, {len(pages)} pages")
+    index.commit()
+    index.execute("INSERT INTO page_text (page_text) VALUES ('optimize')")
+    index.commit()
+    pages = sum(count for _, count in raw.values())
+    print(f"🎉 Indexed {len(raw)} PDFs ({pages} pages read with PyPDF2, the rest from cache) into {INDEX_DB}")
+    index.close()
+
+
+def search(query, kind=None, year=None, limit=20):
+    """[(name, kind, year, page, snippet)] for the pages matching an FTS5 query, best first"""
+    sql = """
+        SELECT d.name, d.kind, d.year, p.page, snippet(page_text, 0, '[', ']', '…', 16)
+        FROM page_text p JOIN documents d ON d.id = p.document_id
+        WHERE page_text MATCH ?
+    """
+    params = [query]
+    if kind:
+        sql += " AND d.kind = ?"
+        params.append(kind)
+    if year:
+        sql += " AND d.year = ?"
+        params.append(int(year))
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(limit)
+    index = connect_index()
+    try:
+        return index.execute(sql, params).fetchall()
+    finally:
+        index.close()
+
+
+def _option(args, flag, default=None):
+    """Value after flag in args (removed from args), or default"""
+    if flag not in args:
+        return default
+    i = args.index(flag)
+    value = args[i + 1]
+    del args[i:i + 2]
+    return value
+
+
+def main():
+    args = sys.argv[1:]
+    if '--build' in args:
+        args.remove('--build')
+        workers = _option(args, '--workers')
+        sources = {pdf_path: 'acfr' for pdf_path in _pdf_files(ACFR_DIR)}
+        sources.update((pdf_path, 'cop') for pdf_path in _pdf_files(COP_DIR))
+        sources.update((pdf_path, 'budget') for pdf_path in _pdf_files(BUDGET_DIR))
+        # ACFRs kept outside Sourced Data/ACFR
+        for path in args:
+            sources.update((pdf_path, 'acfr') for pdf_path in _pdf_files(path))
+        build_index(sources, int(workers) if workers else None)
+        return
+
+    if not args:
+        index = connect_index()
+        rows = index.execute("SELECT kind, year, name, page_count FROM documents ORDER BY kind, year, name").fetchall()
+        index.close()
+        if not rows:
+            print("Usage: python pdf_text_index.py --build [acfr_pdf_or_dir ...] | <query> [--kind K] [--year Y]")
+            return
+        print(f"📄 {len(rows)} documents in {INDEX_DB}")
+        for kind, year, name, page_count in rows:
+            print(f"  {kind:<7} {year or '????'}  {name} ({page_count} pages)")
+        return
+
+    kind = _option(args, '--kind')
+    year = _option(args, '--year')
+    limit = int(_option(args, '--limit', 20))
+    query = ' '.join(args)
+    start = time.perf_counter()
+    try:
+        results = search(query, kind, year, limit)
+    except sqlite3.OperationalError as e:
+        print(f"❌ Bad query {query!r}: {e}")
+        return
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print(f"🔍 {len(results)} pages for {query!r} ({elapsed:.1f} ms)")
+    for name, kind, year, page, snippet in results:
+        print(f"  {name} ({kind} {year or '????'}) p{page}: {' '.join(snippet.split())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,21 +2,136 @@
 """
 Simple PDF Text Extractor for ACFR files
 Uses only built-in Python libraries - no external dependencies required
+pdftotext runs over chunks of pages in parallel, and each chunk's text is
+searched as it arrives, so the whole document is never held in memory.
+Pages are stored in pdf_page_cache.sqlite, so re-running on an unchanged
+PDF skips the conversion. Without pdftotext, pdf_stream_text reads the
+content streams directly (zlib only), page by page.
 """
 
 import os
 import sys
 import re
+import shutil
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
 
+from keyword_matcher import KeywordMatcher
+from pdf_page_cache import connect, file_hash, get_pages, put_pages
+from pdf_stream_text import iter_pdf_text
+
+PDFTOTEXT_EXTRACTOR = "pdftotext"
+
+# Pages per pdftotext run, and the time one run may take
+PAGES_PER_CHUNK = 20
+CHUNK_TIMEOUT = 300
+
+COP_KEYWORDS = [
+    'certificate of participation',
+    'certificates of participation', 
+    'long-term debt',
+    'outstanding debt',
+    'debt service',
+    'principal amount',
+    'interest rate',
+    'maturity date',
+    'annual debt service'
+]
+
+# Look for dollar amounts and percentages
+FINANCIAL_PATTERNS = [
+    re.compile(r'\$[\d,]+\.?\d*', re.IGNORECASE),  # Dollar amounts like $123,456.78
+    re.compile(r'[\d,]+\.?\d*\s*million', re.IGNORECASE),  # Numbers with "million"
+    re.compile(r'[\d,]+\.?\d*\s*billion', re.IGNORECASE),  # Numbers with "billion" 
+    re.compile(r'\d+\.\d+%', re.IGNORECASE),  # Percentages like 4.25%
+    re.compile(r'\d{4}', re.IGNORECASE),  # Years like 2024
+]
+FINANCIAL_MATCH_LIMIT = 10
+SAMPLE_CHARS = 5000
+
+def pdf_page_count(pdf_path):
+    """Number of pages from pdfinfo (installed with pdftotext), or PyPDF2 if available"""
+    try:
+        result = subprocess.run(['pdfinfo', str(pdf_path)], capture_output=True, text=True, timeout=60)
+        match = re.search(r'^Pages:\s+(\d+)', result.stdout, re.MULTILINE)
+        if match:
+            return int(match.group(1))
+    except Exception:
+        pass
+    try:
+        import PyPDF2
+        return len(PyPDF2.PdfReader(str(pdf_path)).pages)
+    except Exception:
+        return None
+
+def _run_pdftotext(pdf_path, first, last=None):
+    """pdftotext output for pages first..last (to the end if last is None)"""
+    command = ['pdftotext', '-f', str(first)] + (['-l', str(last)] if last else []) + [str(pdf_path), '-']
+    return subprocess.run(command, capture_output=True, text=True, timeout=CHUNK_TIMEOUT, check=True).stdout
+
+def _pdftotext_chunk(pdf_path, first, last=None):
+    """{page: (text, None)} for pages first..last (to the end if last is None)"""
+    # pdftotext ends every page with a form feed
+    pages = _run_pdftotext(pdf_path, first, last).split('\f')[:-1]
+    if last and len(pages) != last - first + 1:
+        # A form feed inside the page text: convert the pages one at a time
+        pages = [_run_pdftotext(pdf_path, page_num, page_num)[:-1] for page_num in range(first, last + 1)]
+    return {page_num: (text, None) for page_num, text in enumerate(pages, first)}
+
+def pdftotext_pages(pdf_path, workers=None):
+    """Yield the text of each page in order
+
+    pdftotext runs over PAGES_PER_CHUNK pages at a time, with up to
+    `workers` runs in flight ahead of the reader. Chunks already in the
+    page cache are not converted again. Raises FileNotFoundError when
+    pdftotext is not installed and CalledProcessError if a run fails.
+    """
+    if shutil.which('pdftotext') is None:
+        raise FileNotFoundError("pdftotext is not installed")
+    workers = workers or os.cpu_count() or 1
+    page_count = pdf_page_count(pdf_path)
+    if page_count:
+        chunks = [(first, min(first + PAGES_PER_CHUNK - 1, page_count))
+                  for first in range(1, page_count + 1, PAGES_PER_CHUNK)]
+    else:
+        # Unknown page count: one run over the whole document
+        chunks = [(1, None)]
+
+    digest = file_hash(pdf_path)
+    cache = connect()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            chunks = iter(chunks)
+            pending = deque()
+            while True:
+                while len(pending) < workers:
+                    first, last = next(chunks, (None, None))
+                    if first is None:
+                        break
+                    wanted = range(first, last + 1) if last else None
+                    cached = get_pages(cache, digest, PDFTOTEXT_EXTRACTOR, wanted) if wanted else {}
+                    if wanted and len(cached) == len(wanted):
+                        pending.append((cached, None))
+                    else:
+                        pending.append((None, executor.submit(_pdftotext_chunk, pdf_path, first, last)))
+                if not pending:
+                    break
+                pages, future = pending.popleft()
+                if future is not None:
+                    pages = future.result()
+                    put_pages(cache, digest, PDFTOTEXT_EXTRACTOR, pages)
+                for page_num in sorted(pages):
+                    yield pages[page_num][0]
+    finally:
+        cache.close()
+
 def extract_text_with_pdftotext(pdf_path):
-    """Try to extract text using pdftotext command (if available)"""
+    """Try to extract text using pdftotext command (if available), via the page cache"""
     try:
-        import subprocess
-        result = subprocess.run(['pdftotext', str(pdf_path), '-'], 
-                              capture_output=True, text=True, timeout=300)
-        if result.returncode == 0:
-            return result.stdout
+        return ''.join(text + '\f' for text in pdftotext_pages(pdf_path))
     except Exception as e:
         print(f"pdftotext not available: {e}")
     return None
@@ -24,7 +139,6 @@ def extract_text_with_pdftotext(pdf_path):
 def extract_text_with_strings(pdf_path):
     """Fallback: extract readable strings from PDF using 'strings' command"""
     try:
-        import subprocess
         result = subprocess.run(['strings', str(pdf_path)], 
                               capture_output=True, text=True, timeout=300)
         if result.returncode == 0:
@@ -33,60 +147,72 @@ def extract_text_with_strings(pdf_path):
         print(f"strings command not available: {e}")
     return None
 
+def _line_batches(chunks):
+    """Complete lines from each chunk of a text stream (split on '\n' across chunk boundaries)"""
+    partial = ''
+    for chunk in chunks:
+        lines = (partial + chunk).split('\n')
+        partial = lines.pop()
+        if lines:
+            yield lines
+    yield [partial]
+
+def search_cop_chunks(chunks):
+    """Yield COP context lines for text arriving in chunks, holding only a few lines at a time"""
+    matcher = KeywordMatcher(COP_KEYWORDS)
+    previous = deque(maxlen=2)
+    pending = deque()  # [context, lines still to add] for matches waiting on the lines below them
+    line_number = 0
+    for lines in _line_batches(chunks):
+        # One pass over the batch instead of one per keyword per line
+        hits = set(matcher.matching_lines('\n'.join(lines)))
+        for i, line in enumerate(lines):
+            for context in pending:
+                context[0].append(line)
+                context[1] -= 1
+            if i in hits:
+                # Include some context around the match
+                pending.append([[f"--- CONTEXT AROUND LINE {line_number + 1} ---", *previous, line], 2])
+            while pending and pending[0][1] == 0:
+                yield from pending.popleft()[0]
+                yield ""
+            previous.append(line)
+            line_number += 1
+    for context, _ in pending:
+        yield from context
+        yield ""
+
 def search_cop_content(text):
     """Search for COP-related content in extracted text"""
     if not text:
         return []
-    
-    cop_keywords = [
-        'certificate of participation',
-        'certificates of participation', 
-        'long-term debt',
-        'outstanding debt',
-        'debt service',
-        'principal amount',
-        'interest rate',
-        'maturity date',
-        'annual debt service'
-    ]
-    
-    lines = text.split('\n')
-    relevant_lines = []
-    
-    for i, line in enumerate(lines):
-        line_lower = line.lower()
-        if any(keyword in line_lower for keyword in cop_keywords):
-            # Include some context around the match
-            start = max(0, i-2)
-            end = min(len(lines), i+3)
-            context = lines[start:end]
-            relevant_lines.append(f"--- CONTEXT AROUND LINE {i+1} ---")
-            relevant_lines.extend(context)
-            relevant_lines.append("")
-    
-    return relevant_lines
+    return list(search_cop_chunks([text]))
 
 def extract_financial_numbers(text):
     """Extract potential financial figures from text"""
     if not text:
         return []
-    
-    # Look for dollar amounts and percentages
-    financial_patterns = [
-        r'\$[\d,]+\.?\d*',  # Dollar amounts like $123,456.78
-        r'[\d,]+\.?\d*\s*million',  # Numbers with "million"
-        r'[\d,]+\.?\d*\s*billion',  # Numbers with "billion" 
-        r'\d+\.\d+%',  # Percentages like 4.25%
-        r'\d{4}',  # Years like 2024
-    ]
-    
-    findings = []
-    for pattern in financial_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        if matches:
-            findings.append(f"Pattern '{pattern}': {matches[:10]}")  # Limit to first 10 matches
-    
-    return findings
+    return scan_text_chunks([text])['financial_numbers']
+
+def scan_text_chunks(chunks):
+    """One pass over a text stream: COP context, financial figures, length and opening sample"""
+    found = [[] for _ in FINANCIAL_PATTERNS]
+    scan = {'chars': 0, 'sample': ''}
+
+    def observed(chunks):
+        for chunk in chunks:
+            scan['chars'] += len(chunk)
+            if len(scan['sample']) < SAMPLE_CHARS:
+                scan['sample'] += chunk[:SAMPLE_CHARS - len(scan['sample'])]
+            for pattern, matches in zip(FINANCIAL_PATTERNS, found):
+                if len(matches) < FINANCIAL_MATCH_LIMIT:
+                    matches.extend(m.group() for m in islice(pattern.finditer(chunk), FINANCIAL_MATCH_LIMIT - len(matches)))
+            yield chunk
+
+    scan['cop_content'] = list(search_cop_chunks(observed(chunks)))
+    scan['financial_numbers'] = [f"Pattern '{pattern.pattern}': {matches}"
+                                 for pattern, matches in zip(FINANCIAL_PATTERNS, found) if matches]
+    return scan
 
 def process_pdf_file(pdf_path):
     """Process a single PDF file"""
@@ -95,26 +221,40 @@ def process_pdf_file(pdf_path):
     print(f"File size: {pdf_path.stat().st_size / (1024*1024):.1f} MB")
     
     # Try different extraction methods
-    text = None
+    scan = None
     
-    # Method 1: pdftotext (best quality)
+    # Method 1: pdftotext (best quality), searched page chunk by page chunk
     print("Trying pdftotext extraction...")
-    text = extract_text_with_pdftotext(pdf_path)
+    try:
+        scan = scan_text_chunks(text + '\f' for text in pdftotext_pages(pdf_path))
+    except Exception as e:
+        print(f"pdftotext not available: {e}")
     
-    # Method 2: strings command (fallback)
-    if not text:
+    # Method 2: inflate the content streams in Python, page by page
+    # (a scan with only page breaks in it means no text layer came out)
+    if not scan or not scan['sample'].strip():
+        print("Trying built-in content stream extraction...")
+        try:
+            scan = scan_text_chunks(text + '\f' for text in iter_pdf_text(pdf_path))
+        except Exception as e:
+            print(f"Content stream extraction failed: {e}")
+            scan = None
+
+    # Method 3: strings command (last resort)
+    if not scan or not scan['sample'].strip():
         print("Trying strings extraction...")
         text = extract_text_with_strings(pdf_path)
+        scan = scan_text_chunks([text]) if text else None
     
-    if not text:
+    if not scan or not scan['chars']:
         print("❌ Could not extract text from PDF")
         return False
     
-    print(f"✅ Extracted {len(text)} characters of text")
+    print(f"✅ Extracted {scan['chars']} characters of text")
     
     # Search for COP-related content
-    cop_content = search_cop_content(text)
-    financial_numbers = extract_financial_numbers(text)
+    cop_content = scan['cop_content']
+    financial_numbers = scan['financial_numbers']
     
     if not cop_content and not financial_numbers:
         print("⚠️ No COP-related content found")
@@ -143,11 +283,11 @@ def process_pdf_file(pdf_path):
             f.write("\n\n")
         
         # Include a sample of the full text for manual review
-        f.write("FULL TEXT SAMPLE (first 5000 characters):\n")
+        f.write(f"FULL TEXT SAMPLE (first {SAMPLE_CHARS} characters):\n")
         f.write("-"*40 + "\n")
-        f.write(text[:5000])
-        if len(text) > 5000:
-            f.write(f"\n\n... (truncated, full text was {len(text)} characters)")
+        f.write(scan['sample'])
+        if scan['chars'] > SAMPLE_CHARS:
+            f.write(f"\n\n... (truncated, full text was {scan['chars']} characters)")
     
     print(f"✅ Results saved to: {output_file}")
     return True
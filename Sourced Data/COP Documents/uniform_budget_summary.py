@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Colorado Uniform Budget Summary parser
+Reads the fund-by-program totals from a district's Uniform Budget Summary
+filing, either from pdfplumber's detected tables or through a template.
+
+A template holds the cell positions of the fund header and of each line
+item, learned once from a filing whose tables parse cleanly and stored in
+pdf_page_cache.sqlite. Later filings on the same form are read by cropping
+those cells with within_bbox, so table detection is skipped, and so are
+the pages that hold no line items. A filing that doesn't fit any template
+(page size, fund codes or row labels differ) goes back to the table path.
+
+Usage:
+  python uniform_budget_summary.py <pdf> [...]   # time both paths and compare
+"""
+
+import hashlib
+import json
+import re
+import sys
+import time
+
+import pdfplumber
+
+from extract_acfr_text import LAYOUT_EXTRACTOR, pdfplumber_pages, pypdf2_pages
+from pdf_page_cache import connect, get_templates, put_template
+from pdf_tables import parse_number
+
+# Template cache key; cell positions depend on the pdfplumber version
+TEMPLATE_KIND = f"uniform-budget-summary:{LAYOUT_EXTRACTOR}"
+
+# Row labels in the summary table -> output field (values taken from the TOTAL column)
+LINE_ITEMS = {
+    'total revenues': 'totalRevenues',
+    'total instruction': 'instructionalSpending',
+    'total supporting services': 'supportServices',
+    'total property': 'capitalProjects',
+    'total expenditures': 'totalBudget',
+}
+
+GENERAL_FUND = '10'
+BOND_REDEMPTION_FUND = '31'
+
+FISCAL_YEAR = re.compile(r'FY\s*(20\d\d)\s*-\s*\d{2,4}')
+PUPIL_COUNT = re.compile(r'Pupil Count:?\s*([\d,]+(?:\.\d+)?)', re.IGNORECASE)
+
+# Cell boxes are widened by this share of the row height above and below, so
+# within_bbox keeps glyphs that overhang the ruling lines but not the next row
+ROW_PADDING = 0.4
+
+
+def _normalize(cell):
+    return ' '.join((cell or '').split())
+
+
+def _fund_start(row):
+    """Index of the General Fund cell if row is the fund header (ending in TOTAL), else None"""
+    cells = [_normalize(cell) for cell in row]
+    start = next((i for i, cell in enumerate(cells) if cell.startswith(GENERAL_FUND + ' ')), None)
+    return start if start is not None and cells[-1].upper() == 'TOTAL' else None
+
+
+def _fund_codes(cells):
+    # 'Fiduciary: Trust ...' has no code on some forms, so keep the first word either way
+    return [_normalize(cell).split(' ')[0] for cell in cells[:-1]] + ['TOTAL']
+
+
+def _fund_columns(tables):
+    """Fund codes in column order (ending with 'TOTAL') from the summary's header row"""
+    for table in tables or []:
+        for row in table:
+            start = _fund_start(row)
+            if start is not None:
+                return _fund_codes(row[start:])
+    return None
+
+
+def header_fields(text):
+    """Fiscal start year and budgeted pupil count (None when the form leaves it at 0)"""
+    year = FISCAL_YEAR.search(text)
+    pupils = PUPIL_COUNT.search(text)
+    count = float(pupils.group(1).replace(',', '')) if pupils else 0.0
+    return {'fiscalYear': int(year.group(1)) if year else None, 'budgetedPupilCount': count or None}
+
+
+def parse_uniform_budget_summary(layout):
+    """Line items of one Uniform Budget Summary from {page: (text, tables)}, or None
+
+    Rows are matched to funds by their non-empty numeric cells in header order,
+    since pdfplumber splits some columns into empty cells on later pages.
+    """
+    pages = [layout[page_num] for page_num in sorted(layout)]
+    funds = next((columns for _, tables in pages if (columns := _fund_columns(tables))), None)
+    if funds is None:
+        return None
+
+    summary = {'funds': funds, 'lineItems': {}}
+    for _, tables in pages:
+        for table in tables or []:
+            for row in table:
+                label = _normalize(row[0]).lower() if row else ''
+                if label not in LINE_ITEMS or LINE_ITEMS[label] in summary['lineItems']:
+                    continue
+                values = [parse_number(cell) for cell in row[1:] if cell not in (None, '')]
+                if len(values) != len(funds) or None in values:
+                    print(f"⚠️  Skipping '{row[0]}': {len(values)} values for {len(funds)} funds")
+                    continue
+                summary['lineItems'][LINE_ITEMS[label]] = dict(zip(funds, values))
+
+    summary.update(header_fields('\n'.join(text or '' for text, _ in pages)))
+    return summary
+
+
+def _padded(bbox, row_height):
+    x0, top, x1, bottom = bbox
+    pad = row_height * ROW_PADDING
+    return [round(x0 - 0.5, 2), round(top - pad, 2), round(x1 + 0.5, 2), round(bottom + pad, 2)]
+
+
+def _clamp(page, box):
+    x0, top, x1, bottom = page.bbox
+    return (max(box[0], x0), max(box[1], top), min(box[2], x1), min(box[3], bottom))
+
+
+def _band(page, boxes):
+    """The part of page spanning all boxes, so each box is cut from fewer objects"""
+    return page.within_bbox(_clamp(page, (min(box[0] for box in boxes), min(box[1] for box in boxes),
+                                          max(box[2] for box in boxes), max(box[3] for box in boxes))))
+
+
+def _crop_text(page, box):
+    """Text fully inside box (clamped to the page)"""
+    return _normalize(page.within_bbox(_clamp(page, box)).extract_text())
+
+
+def _page_size(page):
+    return [round(float(page.width), 1), round(float(page.height), 1)]
+
+
+def _read_template(pdf, template):
+    """{field: {fund: value}} read through one template, or None if the PDF doesn't fit it"""
+    if len(pdf.pages) != template['pageCount'] or _page_size(pdf.pages[0]) != template['pageSize']:
+        return None
+    header = template['header']
+    band = _band(pdf.pages[header['page'] - 1], header['cells'])
+    if _fund_codes([_crop_text(band, box) for box in header['cells']]) != template['funds']:
+        return None
+
+    items = {}
+    for field, row in template['rows'].items():
+        band = _band(pdf.pages[row['page'] - 1], [row['labelBox']] + row['cells'])
+        if _crop_text(band, row['labelBox']).lower() != row['label'].lower():
+            return None
+        values = [parse_number(_crop_text(band, box)) for box in row['cells']]
+        if None in values:
+            return None
+        items[field] = dict(zip(template['funds'], values))
+    return items
+
+
+def extract_with_templates(pdf_path, templates, text):
+    """Summary read through the first stored template that fits the PDF, or None
+
+    text is the filing's plain text, for the fiscal year and pupil count.
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        for name, template in templates.items():
+            items = _read_template(pdf, template)
+            if items is not None:
+                summary = {'funds': template['funds'], 'lineItems': items, 'template': name}
+                summary.update(header_fields(text))
+                return summary
+    return None
+
+
+def learn_template(pdf_path, summary):
+    """(name, template) for the form of a filing already parsed by the table path
+
+    Returns None if the cells can't be located, or if reading the filing back
+    through the template gives different numbers than the table path did.
+    """
+    funds = summary['funds']
+    with pdfplumber.open(pdf_path) as pdf:
+        template = {'pageCount': len(pdf.pages), 'pageSize': _page_size(pdf.pages[0]),
+                    'funds': funds, 'header': None, 'rows': {}}
+        for page in pdf.pages:
+            for table in page.find_tables():
+                for row, cells in zip(table.rows, table.extract()):
+                    height = row.bbox[3] - row.bbox[1]
+                    start = _fund_start(cells) if template['header'] is None else None
+                    if start is not None and _fund_codes(cells[start:]) == funds:
+                        template['header'] = {'page': page.page_number,
+                                              'cells': [_padded(box, 0) for box in row.cells[start:]]}
+                        continue
+                    label = _normalize(cells[0])
+                    field = LINE_ITEMS.get(label.lower())
+                    if field is None or field in template['rows'] or field not in summary['lineItems']:
+                        continue
+                    boxes = [box for box, cell in zip(row.cells[1:], cells[1:]) if cell not in (None, '')]
+                    if len(boxes) != len(funds):
+                        return None
+                    template['rows'][field] = {'page': page.page_number, 'label': label,
+                                               'labelBox': _padded(row.cells[0], height),
+                                               'cells': [_padded(box, height) for box in boxes]}
+        if template['header'] is None or set(template['rows']) != set(summary['lineItems']):
+            return None
+        if _read_template(pdf, template) != summary['lineItems']:
+            return None
+
+    digest = hashlib.sha1(json.dumps(template, sort_keys=True).encode()).hexdigest()[:10]
+    return f"{template['pageCount']}p-{len(funds) - 1}funds-{digest}", template
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python uniform_budget_summary.py <pdf> [...]")
+        return
+
+    cache = connect()
+    templates = get_templates(cache, TEMPLATE_KIND)
+    for pdf_path in sys.argv[1:]:
+        start = time.perf_counter()
+        with pdfplumber.open(pdf_path) as pdf:
+            page_numbers = list(range(1, len(pdf.pages) + 1))
+        table = parse_uniform_budget_summary(pdfplumber_pages(pdf_path, page_numbers))
+        table_time = time.perf_counter() - start
+        if table is None:
+            print(f"❌ {pdf_path}: no Uniform Budget Summary table")
+            continue
+
+        text = '\n'.join(text or '' for text, _ in pypdf2_pages(pdf_path, page_numbers).values())
+        start = time.perf_counter()
+        fast = extract_with_templates(pdf_path, templates, text)
+        template_time = time.perf_counter() - start
+        if fast is None:
+            learned = learn_template(pdf_path, table)
+            if learned is None:
+                print(f"⚠️  {pdf_path}: no template fits and none could be learned")
+                continue
+            put_template(cache, TEMPLATE_KIND, *learned)
+            templates[learned[0]] = learned[1]
+            print(f"📄 Learned template {learned[0]} from {pdf_path}")
+            start = time.perf_counter()
+            fast = extract_with_templates(pdf_path, templates, text)
+            template_time = time.perf_counter() - start
+
+        same = fast['lineItems'] == table['lineItems']
+        print(f"{'✅' if same else '❌'} {pdf_path}: tables {table_time:.2f}s, "
+              f"template {fast['template']} {template_time:.2f}s" + ('' if same else ', values differ'))
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,55 @@
+import sys
+import time
+from pathlib import Path
+
 import pandas as pd
 
+# cmas_formats lives one level up in "Sourced Data"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from cmas_formats import cached_fingerprint, detect_format, read_level_rows
+
 # Path to the Excel file
 efile = "2024 CMAS ELA and Math District and School Summary Results.xlsx"
 
-# Try to find the header row and print headers and a sample of data
+# Print headers and a sample of the district summary rows, using the
+# workbook's registered layout (sheet, header row, grade/subject columns)
 def find_header_and_preview(filepath):
-    # Read the first 40 rows to find the header
-    preview = pd.read_excel(filepath, None, nrows=40)
-    # If multiple sheets, just use the first one
-    if isinstance(preview, dict):
-        sheet = list(preview.keys())[0]
-        df_preview = pd.read_excel(filepath, sheet_name=sheet, header=None, nrows=40)
+    start = time.time()
+
+    try:
+        name, fmt = detect_format(filepath)
+    except ValueError as e:
+        print(f"❌ {e}")
+        print("Add this layout to cmas_formats.CMAS_FORMATS to inspect it")
+        return
+    fingerprint = cached_fingerprint(filepath)
+    headers = fingerprint['headers']
+
+    # Load only the DISTRICT rows; the sheet is read until that block ends
+    rows = read_level_rows(filepath, fmt['sheet'], 'DISTRICT')
+    width = max([len(headers)] + [len(row) for row in rows])
+    headers = headers + [f"Unnamed: {i}" for i in range(len(headers), width)]
+    df = pd.DataFrame([row + [None] * (width - len(row)) for row in rows], columns=headers)
+
+    print(f"Sheets: {fingerprint['sheets']} (inspecting '{fmt['sheet']}')")
+    print(f"Format: {name}, header row {fmt['header_row']}")
+    print("Headers:", [h for h in headers if h and not h.startswith("Unnamed")])
+
+    if 'grade' not in fmt['columns']:
+        print(f"⚠️  Format {name} has no grade column; showing the first DISTRICT rows")
+        print(df.head(10))
     else:
-        df_preview = pd.read_excel(filepath, header=None, nrows=40)
-
-    # Try to find the header row: look for a row with mostly non-empty string values and not 'Unnamed'
-    header_row = None
-    for i, row in df_preview.iterrows():
-        str_count = row.apply(lambda x: isinstance(x, str) and x.strip() != "" and not x.startswith("Unnamed"))
-        if str_count.sum() > (len(row) // 2):
-            header_row = i
-            break
-    if header_row is None:
-        header_row = 0  # fallback
-
-    # Read the file again with the detected header
-    df = pd.read_excel(filepath, header=header_row)
-    # Filter for Level == 'DISTRICT' and Grade == 'All Grades'
-    filtered_df = df[(df['Level'] == 'DISTRICT') & (df['Grade'] == 'All Grades')]
-    print(f"Header row detected at: {header_row}")
-    print("Headers:", list(filtered_df.columns))
-    print("Filtered sample data (Level='DISTRICT' and Grade='All Grades'):")
-    print(filtered_df.head(10))
+        grade_col, grade_label = fmt['columns']['grade']
+        grades = df.iloc[:, grade_col].map(lambda value: ' '.join(str(value).split()))
+        filtered_df = df[grades == 'All Grades']
+        if filtered_df.empty:
+            print(f"⚠️  No 'All Grades' rows in the '{grade_label}' column of format {name} "
+                  f"(grades: {', '.join(dict.fromkeys(grades))[:200]}); showing the first DISTRICT rows")
+            print(df.head(10))
+        else:
+            print(f"Filtered sample data (Level='DISTRICT' and {grade_label}='All Grades'):")
+            print(filtered_df.head(10))
+    print(f"{len(df)} DISTRICT rows, inspected in {time.time() - start:.2f}s")
 
 if __name__ == "__main__":
-    find_header_and_preview(efile)
+    find_header_and_preview(sys.argv[1] if len(sys.argv) > 1 else efile)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Precompute statewide district rankings for the map
+Ranks every district against the rest of the state for each year and metric
+(enrollment, FRL %, CMAS % met/exceeded) and writes the results back into
+public/district_data_complete.json. Statewide min/max and quantile
+breakpoints per year go to public/district_statewide_stats.json so the map
+can color districts without scanning every district on each render.
+
+Run after unified_data_processor.js:
+  python add_district_rankings.py
+"""
+
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent
+DISTRICT_DATA = BASE_DIR.parent / "public" / "district_data_complete.json"
+STATS_OUTPUT = BASE_DIR.parent / "public" / "district_statewide_stats.json"
+
+# Metric name -> (list in the district record, value key)
+METRICS = {
+    'enrollment': ('enrollment_trends', 'enrollment'),
+    'frl': ('enrollment_trends', 'frl'),
+    'cmas': ('cmas_scores', 'met_or_exceeded_pct'),
+}
+
+QUANTILES = [0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+
+
+def is_district(name):
+    """Skip placeholder keys such as '9999' that are bare codes, not districts"""
+    return not name.strip().isdigit()
+
+
+def build_matrices(district_data):
+    """District x year matrix for each metric (NaN where a district has no value)"""
+    matrices = {}
+    for metric, (list_key, value_key) in METRICS.items():
+        records = [
+            {'district': name, 'year': entry['year'], 'value': entry.get(value_key)}
+            for name, data in district_data.items() if is_district(name)
+            for entry in data.get(list_key, [])
+        ]
+        long_df = pd.DataFrame(records, columns=['district', 'year', 'value'])
+        long_df['value'] = pd.to_numeric(long_df['value'], errors='coerce')
+        # enrollment of 0 means "no data" in the processor output
+        if metric == 'enrollment':
+            long_df.loc[long_df['value'] <= 0, 'value'] = float('nan')
+        matrices[metric] = long_df.pivot_table(index='district', columns='year',
+                                               values='value', aggfunc='first')
+    return matrices
+
+
+def rank_matrices(matrices):
+    """Rank (1 = highest) and percentile of every district within each year column"""
+    ranks = {}
+    for metric, wide in matrices.items():
+        rank = wide.rank(axis=0, method='min', ascending=False)
+        percentile = (wide.rank(axis=0, method='max', pct=True) * 100).round(1)
+        ranks[metric] = (rank, percentile)
+    return ranks
+
+
+def statewide_stats(matrices):
+    """Per-year count, min, max and quantile breakpoints for each metric"""
+    stats = {}
+    for metric, wide in matrices.items():
+        breakpoints = wide.quantile(QUANTILES, axis=0)
+        stats[metric] = {}
+        for year in wide.columns:
+            column = wide[year].dropna()
+            if column.empty:
+                continue
+            stats[metric][year] = {
+                'count': int(column.count()),
+                'min': round(float(column.min()), 1),
+                'max': round(float(column.max()), 1),
+                'breakpoints': [round(float(v), 1) for v in breakpoints[year]],
+            }
+    return stats
+
+
+def apply_rankings(district_data, ranks):
+    """Write <metric>_rank / <metric>_percentile into each year entry"""
+    for metric, (list_key, value_key) in METRICS.items():
+        rank, percentile = ranks[metric]
+        for name, data in district_data.items():
+            for entry in data.get(list_key, []):
+                # Clear values from a previous run before writing new ones
+                entry.pop(f'{metric}_rank', None)
+                entry.pop(f'{metric}_percentile', None)
+                if name not in rank.index or entry['year'] not in rank.columns:
+                    continue
+                r = rank.at[name, entry['year']]
+                if pd.isna(r):
+                    continue
+                entry[f'{metric}_rank'] = int(r)
+                entry[f'{metric}_percentile'] = float(percentile.at[name, entry['year']])
+
+
+def main():
+    input_path = Path(sys.argv[1]) if len(sys.argv) > 1 else DISTRICT_DATA
+
+    print(f"Loading {input_path}...")
+    with open(input_path, encoding='utf-8') as f:
+        district_data = json.load(f)
+
+    matrices = build_matrices(district_data)
+    ranks = rank_matrices(matrices)
+    apply_rankings(district_data, ranks)
+
+    with open(input_path, 'w', encoding='utf-8') as f:
+        json.dump(district_data, f, indent=2, ensure_ascii=False)
+    print(f"✅ Rankings written to {input_path}")
+
+    stats = {
+        'generated': datetime.now().isoformat(),
+        'quantiles': QUANTILES,
+        'metrics': statewide_stats(matrices),
+    }
+    stats_path = input_path.parent / STATS_OUTPUT.name
+    with open(stats_path, 'w', encoding='utf-8') as f:
+        json.dump(stats, f, indent=2)
+    print(f"✅ Statewide stats written to {stats_path}")
+
+    for metric, wide in matrices.items():
+        years = ', '.join(f"{year} ({int(wide[year].count())})" for year in wide.columns)
+        print(f"  {metric}: {years}")
+
+
+if __name__ == "__main__":
+    main()
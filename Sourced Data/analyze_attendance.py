@@ -1,30 +1,23 @@
 #!/usr/bin/env python3
-import sys
-import subprocess
+"""
+Profile the attendance workbooks
+Lists the files in "Attendance Data" and previews the structure of the
+sample files. Each workbook is parsed once; the parsed sheet is pickled in
+.attendance_cache/ and reused until the workbook's size or mtime changes.
 
-# Try to import pandas, if not available, install it
-try:
-    import pandas as pd
-except ImportError:
-    print("pandas not found, installing...")
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "pandas", "openpyxl"])
-    import pandas as pd
+Usage:
+  python analyze_attendance.py [attendance_dir]
+"""
 
-import os
+import hashlib
+import sys
 from pathlib import Path
 
-# Define the attendance data directory
-attendance_dir = Path("/mnt/c/Users/popta/OneDrive/Desktop/Brian Stuff/Court Case/Documents for GPT/CO_District_Map_App_Charts_FULL/Sourced Data/Attendance Data")
+import pandas as pd
 
-# List all files in the directory
-files = sorted(list(attendance_dir.glob("*.xlsx")))
-print(f"\nTotal Excel files in Attendance Data folder: {len(files)}")
-print("\n=== FILE LIST ===")
-for f in files:
-    print(f"  - {f.name}")
+from process_attendance_data import ATTENDANCE_DIR, HEADER_ROW
 
-# Analyze each file type
-print("\n=== ANALYZING FILE STRUCTURE ===")
+CACHE_DIR = Path(__file__).resolve().parent / ".attendance_cache"
 
 # Sample files to analyze
 sample_files = [
@@ -34,51 +27,82 @@ sample_files = [
     "2023-2024 Chronic Absenteeism by School - Suppressed.xlsx"
 ]
 
-for filename in sample_files:
-    filepath = attendance_dir / filename
-    if filepath.exists():
-        print(f"\n--- {filename} ---")
-        try:
-            # Read the Excel file
-            df = pd.read_excel(filepath, nrows=5)  # Read first 5 rows to understand structure
-            
-            print(f"Columns ({len(df.columns)}):")
-            for col in df.columns:
-                print(f"  - {col}")
-            
-            print(f"\nFirst few rows:")
-            print(df.head(3).to_string(index=False, max_cols=10))
-            
-            # Check for DPS schools
-            full_df = pd.read_excel(filepath)
-            if 'DISTRICT_NAME' in full_df.columns:
-                dps_count = full_df[full_df['DISTRICT_NAME'].str.contains('DENVER', case=False, na=False)].shape[0]
-                print(f"\nDPS (Denver) schools found: {dps_count}")
-            elif 'District Name' in full_df.columns:
-                dps_count = full_df[full_df['District Name'].str.contains('DENVER', case=False, na=False)].shape[0]
-                print(f"\nDPS (Denver) schools found: {dps_count}")
-            
-            print(f"Total rows: {len(full_df)}")
-            
-        except Exception as e:
-            print(f"Error reading file: {e}")
-
-# Analyze year coverage
-print("\n=== YEAR COVERAGE ===")
-years = set()
-for f in files:
-    # Extract year from filename
-    if f.name.startswith("20"):
-        year = f.name[:9]  # Gets "2022-2023" format
-        years.add(year)
-
-sorted_years = sorted(years)
-print(f"Years covered: {', '.join(sorted_years)}")
-print(f"Span: {sorted_years[0]} to {sorted_years[-1]}")
-
-# Analyze metrics available
-print("\n=== METRICS AVAILABLE ===")
-print("Based on filenames, the following metrics are tracked:")
-print("1. Truancy Data (2013-2024)")
-print("2. Chronic Absenteeism (2016-2024)")
-print("3. Attendance Rates (2023-2024)")
\ No newline at end of file
+
+def read_workbook_cached(filepath, cache_dir=CACHE_DIR):
+    """Parse the first sheet once and reuse the pickled frame on later runs"""
+    stat = filepath.stat()
+    key = f"{filepath.resolve()}|{stat.st_size}|{stat.st_mtime_ns}|{HEADER_ROW}"
+    cache_file = cache_dir / f"{hashlib.sha1(key.encode()).hexdigest()}.pkl"
+    if cache_file.exists():
+        return pd.read_pickle(cache_file), True
+
+    df = pd.read_excel(filepath, header=HEADER_ROW)
+    cache_dir.mkdir(exist_ok=True)
+    df.to_pickle(cache_file)
+    return df, False
+
+
+def main():
+    attendance_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else ATTENDANCE_DIR
+
+    # List all files in the directory
+    files = sorted(attendance_dir.glob("*.xlsx"))
+    print(f"\nTotal Excel files in Attendance Data folder: {len(files)}")
+    print("\n=== FILE LIST ===")
+    for f in files:
+        print(f"  - {f.name}")
+
+    # Analyze each file type
+    print("\n=== ANALYZING FILE STRUCTURE ===")
+
+    for filename in sample_files:
+        filepath = attendance_dir / filename
+        if filepath.exists():
+            print(f"\n--- {filename} ---")
+            try:
+                full_df, cached = read_workbook_cached(filepath)
+                print(f"({'cached' if cached else 'parsed'})")
+
+                print(f"Columns ({len(full_df.columns)}):")
+                for col in full_df.columns:
+                    print(f"  - {col}")
+
+                print(f"\nFirst few rows:")
+                print(full_df.head(3).to_string(index=False, max_cols=10))
+
+                # Check for DPS schools
+                for name_col in ('DISTRICT_NAME', 'District Name'):
+                    if name_col in full_df.columns:
+                        dps_count = full_df[full_df[name_col].str.contains('DENVER', case=False, na=False)].shape[0]
+                        print(f"\nDPS (Denver) schools found: {dps_count}")
+                        break
+
+                print(f"Total rows: {len(full_df)}")
+
+            except Exception as e:
+                print(f"Error reading file: {e}")
+
+    # Analyze year coverage
+    print("\n=== YEAR COVERAGE ===")
+    years = set()
+    for f in files:
+        # Extract year from filename
+        if f.name.startswith("20"):
+            year = f.name[:9]  # Gets "2022-2023" format
+            years.add(year)
+
+    sorted_years = sorted(years)
+    if sorted_years:
+        print(f"Years covered: {', '.join(sorted_years)}")
+        print(f"Span: {sorted_years[0]} to {sorted_years[-1]}")
+
+    # Analyze metrics available
+    print("\n=== METRICS AVAILABLE ===")
+    print("Based on filenames, the following metrics are tracked:")
+    print("1. Truancy Data (2013-2024)")
+    print("2. Chronic Absenteeism (2016-2024)")
+    print("3. Attendance Rates (2023-2024)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Build a memory-mapped CMAS results cube
+Turns every CMAS workbook into one dense NumPy array with axes
+(entity, year, subject, grade, metric) plus a JSON sidecar of axis labels.
+
+Readers open the cube with np.load(mmap_mode='r') so cross-sections such as
+"math, grade 05, all districts, all years" become plain array slices.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cmas_formats import LEVELS, METRICS, read_cmas_file
+
+BASE_DIR = Path(__file__).resolve().parent
+CMAS_DIR = BASE_DIR / "General CMAS Score Data"
+CUBE_DIR = BASE_DIR / "cmas_cube"
+CUBE_FILE = "cmas_cube.npy"
+INDEX_FILE = "cmas_cube_index.json"
+
+SUBJECTS = ['ELA', 'Math', 'SLA']
+GRADE_ORDER = [
+    'All Grades', '03', '04', '05', '06', '07', '08', '09',
+    'Algebra I', 'Geometry', 'Algebra II',
+    'Integrated I', 'Integrated II', 'Integrated III'
+]
+
+
+def read_all_cmas(cmas_dir=CMAS_DIR):
+    """Read every CMAS workbook in the directory into one long table"""
+    frames = []
+    for file_path in sorted(Path(cmas_dir).glob("*.xlsx")):
+        if file_path.name.startswith('~$'):
+            continue
+        print(f"Reading {file_path.name}...")
+        frame = read_cmas_file(file_path)
+        print(f"  {len(frame)} rows")
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def build_cube(long_df):
+    """Scatter the long table into a dense (entity, year, subject, grade, metric) array"""
+    long_df = long_df.copy()
+    long_df['level_rank'] = long_df['level'].map(LEVELS.index)
+
+    # One entity per district/school code pair, labelled with its latest names
+    latest = (long_df.sort_values('year')
+              .drop_duplicates(['district_code', 'school_code'], keep='last')
+              .sort_values(['level_rank', 'district_code', 'school_code']))
+    entities = latest[['level', 'district_code', 'district_name', 'school_code', 'school_name']]
+    entity_keys = pd.MultiIndex.from_frame(latest[['district_code', 'school_code']])
+
+    years = list(range(int(long_df['year'].min()), int(long_df['year'].max()) + 1))
+    grades = GRADE_ORDER + sorted(set(long_df['grade']) - set(GRADE_ORDER))
+
+    e_idx = entity_keys.get_indexer(pd.MultiIndex.from_frame(long_df[['district_code', 'school_code']]))
+    y_idx = long_df['year'].astype(int).to_numpy() - years[0]
+    s_idx = pd.Index(SUBJECTS).get_indexer(long_df['subject'])
+    g_idx = pd.Index(grades).get_indexer(long_df['grade'])
+
+    cube = np.full((len(entities), len(years), len(SUBJECTS), len(grades), len(METRICS)),
+                   np.nan, dtype=np.float32)
+    cube[e_idx, y_idx, s_idx, g_idx, :] = long_df[METRICS].to_numpy(dtype=np.float32)
+
+    index = {
+        'axes': ['entity', 'year', 'subject', 'grade', 'metric'],
+        'entities': entities.to_dict(orient='records'),
+        'years': years,
+        'tested_years': sorted(int(y) for y in long_df['year'].unique()),
+        'subjects': SUBJECTS,
+        'grades': grades,
+        'metrics': METRICS,
+    }
+    return cube, index
+
+
+def save_cube(cube, index, cube_dir=CUBE_DIR):
+    """Write the cube as .npy plus its label sidecar"""
+    cube_dir = Path(cube_dir)
+    cube_dir.mkdir(exist_ok=True)
+    np.save(cube_dir / CUBE_FILE, cube)
+    with open(cube_dir / INDEX_FILE, 'w') as f:
+        json.dump(index, f, indent=2)
+
+
+def load_cmas_cube(cube_dir=CUBE_DIR):
+    """Open the cube memory-mapped (read only) together with its label index"""
+    cube_dir = Path(cube_dir)
+    with open(cube_dir / INDEX_FILE) as f:
+        index = json.load(f)
+    cube = np.load(cube_dir / CUBE_FILE, mmap_mode='r')
+    return cube, index
+
+
+def axis_position(index, axis, label):
+    """Position of a label on one of the cube's axes ('year', 'subject', 'grade', 'metric')"""
+    return index[axis + 's'].index(label)
+
+
+def entity_positions(index, level):
+    """Positions of all STATE, DISTRICT or SCHOOL entities in the cube"""
+    return [i for i, entity in enumerate(index['entities']) if entity['level'] == level]
+
+
+def main():
+    cmas_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else CMAS_DIR
+    cube_dir = Path(sys.argv[2]) if len(sys.argv) > 2 else CUBE_DIR
+
+    long_df = read_all_cmas(cmas_dir)
+    cube, index = build_cube(long_df)
+    save_cube(cube, index, cube_dir)
+
+    print(f"\nSaved cube {cube.shape} ({cube.nbytes / (1024 * 1024):.1f} MB) to {cube_dir / CUBE_FILE}")
+    print(f"Entities: {len(index['entities'])}, years: {index['years'][0]}-{index['years'][-1]}")
+
+    # Show a sample cross-section straight from the memory-mapped file
+    cube, index = load_cmas_cube(cube_dir)
+    districts = entity_positions(index, 'DISTRICT')
+    math_05 = cube[districts, :, axis_position(index, 'subject', 'Math'),
+                   axis_position(index, 'grade', '05'),
+                   axis_position(index, 'metric', 'pct_met_exceeded')]
+    print("\nMath grade 05 % met/exceeded, statewide district median by year:")
+    for year, column in zip(index['years'], math_05.T):
+        values = column[~np.isnan(column)]
+        print(f"  {year}: {f'{np.median(values):.1f}%' if len(values) else 'no data'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+CMAS cohort growth
+Follows each cohort from grade g in year y to grade g+1 in year y+1 and
+reports the change in % met/exceeded for every district and school.
+
+Works directly on the CMAS cube from build_cmas_cube.py: the year and grade
+axes are shifted against each other once, so all entities, years and
+subjects are compared in a single array operation. 2020 is an empty year in
+the cube, so 2019->2020 and 2020->2021 pairs come out as NaN and are dropped.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from build_cmas_cube import CUBE_DIR, axis_position, load_cmas_cube
+
+OUTPUT_FILE = "cmas_cohort_growth.csv"
+
+
+def cohort_grade_positions(index):
+    """Cube positions of the numbered grades ('03', '04', ...) in grade order"""
+    return [axis_position(index, 'grade', g) for g in sorted(g for g in index['grades'] if g.isdigit())]
+
+
+def cohort_growth(cube, index):
+    """Long table of cohort changes in % met/exceeded (end year minus start year)"""
+    grades = cohort_grade_positions(index)
+    from_grades, to_grades = grades[:-1], grades[1:]
+
+    pct = cube[..., axis_position(index, 'metric', 'pct_met_exceeded')]
+    tested = cube[..., axis_position(index, 'metric', 'valid_scores')]
+
+    # (entity, year, subject, grade) -> shift year by one and grade by one
+    start = pct[:, :-1][..., from_grades]
+    end = pct[:, 1:][..., to_grades]
+    growth = end - start
+
+    e, y, s, g = np.nonzero(~np.isnan(growth))
+    entities = pd.DataFrame(index['entities']).iloc[e].reset_index(drop=True)
+    years = np.asarray(index['years'])
+    grade_labels = np.asarray(index['grades'])
+
+    table = pd.DataFrame({
+        'from_year': years[y],
+        'to_year': years[y + 1],
+        'subject': np.asarray(index['subjects'])[s],
+        'from_grade': grade_labels[np.asarray(from_grades)[g]],
+        'to_grade': grade_labels[np.asarray(to_grades)[g]],
+        'from_valid_scores': tested[:, :-1][..., from_grades][e, y, s, g],
+        'to_valid_scores': tested[:, 1:][..., to_grades][e, y, s, g],
+        'from_pct_met_exceeded': start[e, y, s, g],
+        'to_pct_met_exceeded': end[e, y, s, g],
+        'growth': growth[e, y, s, g].round(1),
+    })
+    return pd.concat([entities, table], axis=1)
+
+
+def main():
+    cube_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else CUBE_DIR
+    output_path = Path(sys.argv[2]) if len(sys.argv) > 2 else cube_dir / OUTPUT_FILE
+
+    try:
+        cube, index = load_cmas_cube(cube_dir)
+    except FileNotFoundError:
+        print(f"❌ No CMAS cube in {cube_dir} - run build_cmas_cube.py first")
+        sys.exit(1)
+
+    growth = cohort_growth(cube, index)
+    growth.to_csv(output_path, index=False)
+    print(f"✅ Saved {len(growth)} cohort comparisons to {output_path}")
+
+    districts = growth[growth['level'] == 'DISTRICT']
+    print(f"Districts: {districts['district_code'].nunique()}, "
+          f"schools: {growth.loc[growth['level'] == 'SCHOOL', 'school_code'].nunique()}")
+    print("\nMedian district cohort growth (percentage points):")
+    summary = districts.pivot_table(index=['from_year', 'to_year'], columns='subject',
+                                    values='growth', aggfunc='median')
+    print(summary.round(1).to_string())
+
+
+if __name__ == "__main__":
+    main()
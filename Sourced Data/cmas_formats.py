@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+CMAS workbook format registry
+Fingerprints a CMAS workbook from its sheet manifest and the first rows of
+sheet XML, then dispatches to the known layout for that release (sheet,
+header row and column positions). Unknown layouts fail fast instead of
+being guessed at.
+
+Usage:
+  python cmas_formats.py                     # fingerprint every CMAS workbook
+  python cmas_formats.py <workbook.xlsx>     # fingerprint one workbook
+"""
+
+import json
+import re
+import sys
+import zipfile
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+from html import unescape
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent
+CMAS_DIR = BASE_DIR / "General CMAS Score Data"
+FINGERPRINT_CACHE = BASE_DIR / "cmas_format_cache.json"
+
+# Rows scanned per sheet when looking for the 'Level' header row
+FINGERPRINT_ROWS = 40
+
+NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+LEVELS = ['STATE', 'DISTRICT', 'SCHOOL']
+METRICS = [
+    'total_records', 'valid_scores', 'participation_rate',
+    'mean_scale_score', 'num_met_exceeded', 'pct_met_exceeded'
+]
+
+SUBJECT_NAMES = {
+    'ELA': 'ELA',
+    'English Language Arts': 'ELA',
+    'Math': 'Math',
+    'Mathematics': 'Math',
+    'Spanish Language Arts': 'SLA',
+}
+
+# Known CMAS release layouts. header_row is 0-based; each column entry is
+# (0-based column index, expected header label with whitespace collapsed).
+# Every label is checked against the fingerprint before a format is used.
+_ID_COLUMNS = {
+    'level': (0, 'Level'),
+    'district_code': (1, 'District Code'),
+    'district_name': (2, 'District Name'),
+    'school_code': (3, 'School Code'),
+    'school_name': (4, 'School Name'),
+}
+
+CMAS_FORMATS = {
+    'cmas_2017': {
+        'sheet': 'District and School Detail_1',
+        'header_row': 4,
+        'columns': dict(_ID_COLUMNS, **{
+            'subject': (5, 'Content'),
+            'grade': (6, 'Test'),
+            'total_records': (7, 'Number of Total Records'),
+            'valid_scores': (8, 'Number of Valid Scores'),
+            'participation_rate': (10, 'Participation Rate'),
+            'mean_scale_score': (11, 'Mean Scale Score'),
+            'num_met_exceeded': (22, 'Number Met or Exceeded Expectations'),
+            'pct_met_exceeded': (23, '% Met or Exceeded Expectations'),
+        }),
+    },
+    'cmas_2018': {
+        'sheet': 'District and School Detail_1',
+        'header_row': 6,
+        'columns': dict(_ID_COLUMNS, **{
+            'subject': (5, 'Content'),
+            'grade': (6, 'Test/Grade'),
+            'total_records': (7, '# of Total Records'),
+            'valid_scores': (8, '# of Valid Scores'),
+            'participation_rate': (10, 'Participation Rate'),
+            'mean_scale_score': (11, 'Mean Scale Score'),
+            'num_met_exceeded': (22, '# Met or Exceeded Expectations'),
+            'pct_met_exceeded': (23, '% Met or Exceeded Expectations'),
+        }),
+    },
+    'cmas_2019': {
+        'sheet': 'CMAS ELA and Math',
+        'header_row': 11,
+        'columns': dict(_ID_COLUMNS, **{
+            'subject': (5, 'Subject'),
+            'grade': (6, 'Grade'),
+            'total_records': (7, 'Number of Total Records'),
+            'valid_scores': (8, 'Number of Valid Scores'),
+            'participation_rate': (10, 'Participation Rate'),
+            'mean_scale_score': (11, 'Mean Scale Score'),
+            'num_met_exceeded': (24, 'Number Met or Exceeded Expectations'),
+            'pct_met_exceeded': (25, 'Percent Met or Exceeded Expectations'),
+        }),
+    },
+    'cmas_2021': {
+        'sheet': 'CMAS ELA and Math',
+        'header_row': 27,
+        'columns': dict(_ID_COLUMNS, **{
+            'subject': (5, 'Content'),
+            'grade': (6, 'Grade'),
+            'total_records': (7, 'Number of Total Records'),
+            'valid_scores': (8, 'Number of Valid Scores'),
+            'participation_rate': (10, 'Participation Rate'),
+            'mean_scale_score': (11, 'Mean Scale Score'),
+            'num_met_exceeded': (23, 'Number Met or Exceeded Expectations'),
+            'pct_met_exceeded': (24, 'Percent Met or Exceeded Expectations'),
+        }),
+    },
+    'cmas_2022': {
+        'sheet': 'CMAS ELA and Math',
+        'header_row': 12,
+        'columns': dict(_ID_COLUMNS, **{
+            'subject': (5, 'Content'),
+            'grade': (6, 'Grade'),
+            'total_records': (7, 'Number of Total Records'),
+            'valid_scores': (8, 'Number of Valid Scores'),
+            'participation_rate': (10, 'Participation Rate'),
+            'mean_scale_score': (13, 'Mean Scale Score'),
+            'pct_met_exceeded': (25, '{year}'),
+        }),
+    },
+    # 2023 layout, unchanged in the 2024 release
+    'cmas_2023': {
+        'sheet': 'CMAS ELA and Math',
+        'header_row': 12,
+        'columns': dict(_ID_COLUMNS, **{
+            'subject': (5, 'Content'),
+            'grade': (6, 'Grade'),
+            'total_records': (7, 'Number of Total Records'),
+            'valid_scores': (8, 'Number of Valid Scores'),
+            'participation_rate': (10, 'Participation Rate {year}'),
+            'mean_scale_score': (13, 'Mean Scale Score'),
+            'num_met_exceeded': (25, 'Number Met or Exceeded Expectations'),
+            'pct_met_exceeded': (26, '{year}'),
+        }),
+    },
+}
+
+
+def normalize_label(value):
+    """Collapse the line breaks and padding CDE puts inside header cells"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ''
+    return ' '.join(str(value).split())
+
+
+def normalize_grade(value):
+    """Map 'ELA Grade 03', 'Mathematics Grade 03' and '03' to '03'"""
+    grade = normalize_label(value)
+    match = re.search(r'Grade (\d{1,2})$', grade)
+    if match:
+        return match.group(1).zfill(2)
+    if grade.isdigit():
+        return grade.zfill(2)
+    return grade
+
+
+def to_number(series):
+    """Parse CDE number strings (' 1,234', '*', '- -', 'N/A') as floats"""
+    cleaned = series.astype(str).str.replace(',', '', regex=False).str.strip()
+    return pd.to_numeric(cleaned, errors='coerce')
+
+
+def workbook_year(file_path):
+    """Release year from a CMAS file name"""
+    match = re.search(r'(20\d{2})', Path(file_path).name)
+    if not match:
+        raise ValueError(f"No year in CMAS file name: {Path(file_path).name}")
+    return int(match.group(1))
+
+
+@lru_cache(maxsize=None)
+def column_letters_index(letters):
+    """0-based column index for column letters like 'AB'"""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+def column_index(cell_ref):
+    """0-based column index for a cell reference like 'AB12'"""
+    return column_letters_index(cell_ref.rstrip('0123456789'))
+
+
+def _sheet_paths(archive):
+    """Ordered (sheet name, zip member) pairs from the workbook manifest"""
+    rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    targets = {rel.get('Id'): rel.get('Target') for rel in rels.iter(PKG_REL_NS + 'Relationship')}
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+
+    sheets = []
+    for sheet in workbook.iter(NS + 'sheet'):
+        target = targets[sheet.get(REL_NS + 'id')]
+        member = target.lstrip('/') if target.startswith('/') else 'xl/' + target
+        sheets.append((sheet.get('name'), member))
+    return sheets
+
+
+def list_sheet_names(file_path):
+    """Sheet names straight from xl/workbook.xml, without parsing any sheet"""
+    with zipfile.ZipFile(file_path) as archive:
+        return [name for name, _ in _sheet_paths(archive)]
+
+
+def _shared_strings(archive, needed):
+    """
+    Resolve the shared-string indices in `needed`, stopping once the last
+    one is read. needed=None resolves the whole table.
+    """
+    if (needed is not None and not needed) or 'xl/sharedStrings.xml' not in archive.namelist():
+        return {}
+    last = max(needed) if needed is not None else None
+    strings = {}
+    index = 0
+    with archive.open('xl/sharedStrings.xml') as f:
+        for _, elem in ET.iterparse(f):
+            if elem.tag != NS + 'si':
+                continue
+            if needed is None or index in needed:
+                strings[index] = ''.join(t.text or '' for t in elem.iter(NS + 't'))
+            elem.clear()
+            if last is not None and index >= last:
+                break
+            index += 1
+    return strings
+
+
+def _shared_string_index(archive, value):
+    """Index of the shared string `value`, reading the table only up to it"""
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return None
+    index = 0
+    with archive.open('xl/sharedStrings.xml') as f:
+        for _, elem in ET.iterparse(f):
+            if elem.tag != NS + 'si':
+                continue
+            if ''.join(t.text or '' for t in elem.iter(NS + 't')) == value:
+                return index
+            elem.clear()
+            index += 1
+    return None
+
+
+def _row_cells(row):
+    """{column: (cell type, raw value)} for one <row> element's non-empty cells"""
+    cells = {}
+    for cell in row:
+        cell_type = cell.get('t')
+        if cell_type == 'inlineStr':
+            value = ''.join(t.text or '' for t in cell.iter(NS + 't'))
+        else:
+            v = cell.find(NS + 'v')
+            value = v.text if v is not None else None
+            if cell_type == 's' and value is not None:
+                value = int(value)
+        if value is not None:
+            cells[column_index(cell.get('r'))] = (cell_type, value)
+    return cells
+
+
+def _resolve_rows(archive, raw_rows):
+    """Value lists (None for empty cells) for raw rows, reading only the shared strings they use"""
+    needed = {value for cells in raw_rows for cell_type, value in cells.values() if cell_type == 's'}
+    strings = _shared_strings(archive, needed)
+    rows = []
+    for cells in raw_rows:
+        row = [None] * (max(cells) + 1 if cells else 0)
+        for col, (cell_type, value) in cells.items():
+            row[col] = strings.get(value) if cell_type == 's' else value
+        rows.append(row)
+    return rows
+
+
+def read_sheet_rows(file_path, sheet_name=None, max_rows=FINGERPRINT_ROWS):
+    """
+    Read the first `max_rows` rows of one sheet straight from its XML.
+    Returns a list of value lists (None for empty cells); the rest of the
+    sheet is never decompressed.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        sheets = _sheet_paths(archive)
+        member = dict(sheets)[sheet_name] if sheet_name else sheets[0][1]
+
+        raw_rows = {}
+        with archive.open(member) as f:
+            for _, elem in ET.iterparse(f):
+                if elem.tag != NS + 'row':
+                    continue
+                row_number = int(elem.get('r'))
+                if row_number > max_rows:
+                    break
+                raw_rows[row_number - 1] = _row_cells(elem)
+                elem.clear()
+
+        return _resolve_rows(archive, [raw_rows.get(i, {}) for i in range(max(raw_rows) + 1 if raw_rows else 0)])
+
+
+_CELL_RE = re.compile(rb'<c r="([A-Z]+)\d+"([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+_TYPE_RE = re.compile(rb'\bt="(\w+)"')
+_VALUE_RE = re.compile(rb'<v>(.*?)</v>', re.S)
+_TEXT_RE = re.compile(rb'<t[^>]*>(.*?)</t>', re.S)
+_SHARED_RE = re.compile(rb'\bt="s"[^>]*><v>(\d+)</v>')
+
+# Bytes of sheet XML decompressed at a time while streaming rows
+STREAM_CHUNK = 1 << 16
+
+
+def _parse_row_xml(row_xml, strings):
+    """Values of one <row> element's cells, positioned by column"""
+    values = {}
+    for letters, attrs, inner in _CELL_RE.findall(row_xml):
+        type_match = _TYPE_RE.search(attrs)
+        cell_type = type_match.group(1) if type_match else b'n'
+        if cell_type == b'inlineStr':
+            value = unescape(b''.join(_TEXT_RE.findall(inner or b'')).decode('utf-8'))
+        else:
+            v = _VALUE_RE.search(inner or b'')
+            if v is None:
+                continue
+            value = unescape(v.group(1).decode('utf-8'))
+            if cell_type == b's':
+                value = strings[int(value)]
+            elif cell_type == b'n':
+                value = float(value)
+        values[column_letters_index(letters.decode())] = value
+
+    row = [None] * (max(values) + 1 if values else 0)
+    for col, value in values.items():
+        row[col] = value
+    return row
+
+
+def read_level_rows(file_path, sheet_name, level):
+    """
+    Rows of one sheet whose column A holds the shared string `level`
+    ('DISTRICT'). CDE lists each level as one contiguous block, so the sheet
+    XML is decompressed only until that block ends; only those rows are
+    parsed, and only the shared strings they use are read.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        member = dict(_sheet_paths(archive))[sheet_name]
+        index = _shared_string_index(archive, level)
+        if index is None:
+            return []
+        in_level = re.compile(rb'<c r="A\d+"[^>]*?t="s"[^>]*><v>' + str(index).encode() + rb'</v>')
+
+        raw_rows = []
+        pending = b''
+        with archive.open(member) as f:
+            while True:
+                chunk = f.read(STREAM_CHUNK)
+                if not chunk:
+                    break
+                pending += chunk
+                end = pending.rfind(b'</row>')
+                if end < 0:
+                    continue
+                for row_xml in pending[:end].split(b'</row>'):
+                    if in_level.search(row_xml):
+                        raw_rows.append(row_xml)
+                    elif raw_rows:
+                        break
+                else:
+                    pending = pending[end + len(b'</row>'):]
+                    continue
+                break
+
+        needed = {int(i) for row_xml in raw_rows for i in _SHARED_RE.findall(row_xml)}
+        strings = _shared_strings(archive, needed)
+    return [_parse_row_xml(row_xml, strings) for row_xml in raw_rows]
+
+
+def fingerprint_workbook(file_path, max_rows=FINGERPRINT_ROWS):
+    """
+    Cheap structural fingerprint: sheet names plus, for the first sheet with
+    a 'Level' header in column A, the header row position and its labels.
+    """
+    sheets = list_sheet_names(file_path)
+    fingerprint = {'sheets': sheets, 'sheet': None, 'header_row': None, 'headers': []}
+    for sheet in sheets:
+        for row_index, row in enumerate(read_sheet_rows(file_path, sheet, max_rows)):
+            if row and normalize_label(row[0]) == 'Level':
+                fingerprint.update({
+                    'sheet': sheet,
+                    'header_row': row_index,
+                    'headers': [normalize_label(value) for value in row],
+                })
+                return fingerprint
+    return fingerprint
+
+
+def _load_cache():
+    if FINGERPRINT_CACHE.exists():
+        try:
+            with open(FINGERPRINT_CACHE) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+
+def _save_cache(cache):
+    try:
+        with open(FINGERPRINT_CACHE, 'w') as f:
+            json.dump(cache, f, indent=2)
+    except OSError as e:
+        print(f"Could not write fingerprint cache: {e}")
+
+
+def cached_fingerprint(file_path):
+    """Fingerprint a workbook, reusing the cached result while size and mtime match"""
+    file_path = Path(file_path).resolve()
+    stat = file_path.stat()
+    key = str(file_path)
+
+    cache = _load_cache()
+    entry = cache.get(key)
+    if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+        return entry['fingerprint']
+
+    fingerprint = fingerprint_workbook(file_path)
+    cache[key] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'fingerprint': fingerprint}
+    _save_cache(cache)
+    return fingerprint
+
+
+def match_format(fingerprint, year):
+    """Name of the registered format whose sheet, header row and labels all match"""
+    headers = fingerprint['headers']
+    for name, fmt in CMAS_FORMATS.items():
+        if fmt['sheet'] != fingerprint['sheet'] or fmt['header_row'] != fingerprint['header_row']:
+            continue
+        if all(idx < len(headers) and headers[idx] == label.format(year=year)
+               for idx, label in fmt['columns'].values()):
+            return name
+    return None
+
+
+def detect_format(file_path):
+    """Return (format name, format spec) for a CMAS workbook, or raise ValueError"""
+    year = workbook_year(file_path)
+    fingerprint = cached_fingerprint(file_path)
+    name = match_format(fingerprint, year)
+    if name is None:
+        raise ValueError(
+            f"Unknown CMAS format for {Path(file_path).name}: sheets={fingerprint['sheets']}, "
+            f"header row={fingerprint['header_row']}, headers={fingerprint['headers']}"
+        )
+    return name, CMAS_FORMATS[name]
+
+
+def read_cmas_file(file_path):
+    """Read one CMAS workbook into a long table using its registered layout"""
+    year = workbook_year(file_path)
+    _, fmt = detect_format(file_path)
+    columns = fmt['columns']
+
+    fields = sorted(columns, key=lambda field: columns[field][0])
+    body = pd.read_excel(
+        file_path,
+        sheet_name=fmt['sheet'],
+        header=None,
+        skiprows=fmt['header_row'] + 1,
+        usecols=[columns[field][0] for field in fields],
+        dtype=object,
+    )
+    body.columns = fields
+    body = body[body['level'].isin(LEVELS)]
+
+    frame = pd.DataFrame({'year': year}, index=body.index)
+    for field in ('level', 'district_code', 'district_name', 'school_code', 'school_name'):
+        frame[field] = body[field].map(normalize_label)
+    frame['subject'] = body['subject'].map(normalize_label).map(SUBJECT_NAMES)
+    frame['grade'] = body['grade'].map(normalize_grade)
+    for metric in METRICS:
+        frame[metric] = to_number(body[metric]) if metric in body else np.nan
+
+    return frame.dropna(subset=['subject']).reset_index(drop=True)
+
+
+def main():
+    if len(sys.argv) > 1:
+        files = [Path(sys.argv[1])]
+    else:
+        files = sorted(f for f in CMAS_DIR.glob("*.xlsx") if not f.name.startswith('~$'))
+
+    for file_path in files:
+        try:
+            name, fmt = detect_format(file_path)
+            print(f"{file_path.name}: {name} (sheet '{fmt['sheet']}', header row {fmt['header_row']})")
+        except ValueError as e:
+            print(f"❌ {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Cross-metric correlation matrices
+Joins attendance, FRL share, enrollment change and CMAS proficiency into one
+school x year (and district x year) panel. For every year it computes
+Pearson and Spearman correlation matrices, using all the pairs that are
+present for each pair of metrics, so a suppressed value only drops the
+pairs it appears in. Results go to public/metric_correlations.json.
+
+Needs the attendance table (process_attendance_data.py) and the CMAS cube
+(build_cmas_cube.py).
+
+Usage:
+  python metric_correlations.py
+"""
+
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from build_cmas_cube import axis_position, entity_positions, load_cmas_cube
+from process_attendance_data import load_attendance_table
+
+BASE_DIR = Path(__file__).resolve().parent
+FRL_FILE = BASE_DIR / "Final FRL_Race_Gender_bySchoolandSchoolFlags.xlsx"
+OUTPUT_JSON = BASE_DIR.parent / "public" / "metric_correlations.json"
+
+KEYS = ['district_code', 'school_code', 'school_year']
+METRICS = [
+    'attendance_rate', 'truancy_rate', 'chronic_absent_rate',
+    'frl_pct', 'enrollment_change', 'cmas_ela_pct', 'cmas_math_pct',
+]
+# Metric pairs (and whole years) with fewer observations than this are left out
+MIN_OBSERVATIONS = 30
+
+
+def spring_year_to_school_year(year):
+    """2024 -> '2023-2024' (CMAS is tested in the spring)"""
+    return f"{int(year) - 1}-{int(year)}"
+
+
+def read_frl(frl_file=FRL_FILE):
+    """School x year PK-12 totals and free/reduced counts from every yearly sheet"""
+    frames = []
+    for sheet, df in pd.read_excel(frl_file, sheet_name=None, dtype=str).items():
+        if not sheet.endswith(' Data'):
+            continue
+        frames.append(pd.DataFrame({
+            'district_code': df['Organization Code'].str.strip().str.zfill(4),
+            'school_code': df['School Code'].str.strip().str.zfill(4),
+            'school_year': sheet.replace(' Data', ''),
+            'enrollment': pd.to_numeric(df['PK-12 Total'], errors='coerce'),
+            'frl_count': pd.to_numeric(df['Free Lunch'], errors='coerce') +
+                         pd.to_numeric(df['Reduced Lunch'], errors='coerce'),
+        }))
+    frl = pd.concat(frames, ignore_index=True)
+    # '0000' rows are district-level students not assigned to a school
+    return frl[frl['school_code'] != '0000']
+
+
+def read_cmas(level):
+    """Entity x year % met/exceeded (all grades) for ELA and Math from the cube"""
+    cube, index = load_cmas_cube()
+    positions = entity_positions(index, level)
+    grade = axis_position(index, 'grade', 'All Grades')
+    metric = axis_position(index, 'metric', 'pct_met_exceeded')
+    entities = pd.DataFrame(index['entities']).iloc[positions]
+    tested = [axis_position(index, 'year', year) for year in index['tested_years']]
+
+    frames = []
+    for subject, column in [('ELA', 'cmas_ela_pct'), ('Math', 'cmas_math_pct')]:
+        values = cube[positions][:, tested, axis_position(index, 'subject', subject), grade, metric]
+        wide = pd.DataFrame(values, columns=[spring_year_to_school_year(y) for y in index['tested_years']])
+        wide[['district_code', 'school_code']] = entities[['district_code', 'school_code']].to_numpy()
+        frames.append(wide.melt(id_vars=['district_code', 'school_code'], var_name='school_year', value_name=column)
+                      .set_index(KEYS))
+    cmas = pd.concat(frames, axis=1).reset_index()
+    if level == 'DISTRICT':
+        cmas = cmas.drop(columns='school_code')
+    return cmas
+
+
+def enrollment_change(frame, keys):
+    """Year-over-year % change in enrollment for each entity (consecutive years only)"""
+    wide = frame.pivot_table(index=keys, columns='school_year', values='enrollment', aggfunc='sum')
+    wide = wide.reindex(columns=sorted(wide.columns))
+    change = (wide.pct_change(axis=1, fill_method=None) * 100).replace([np.inf, -np.inf], np.nan)
+    return change.stack().rename('enrollment_change').reset_index()
+
+
+def school_panel(attendance, frl):
+    """One row per school and year with every metric (NaN where missing)"""
+    frl = frl.assign(frl_pct=frl['frl_count'] / frl['enrollment'] * 100)
+    panel = (attendance[KEYS + ['attendance_rate', 'truancy_rate', 'chronic_absent_rate']]
+             .merge(frl[KEYS + ['frl_pct']], on=KEYS, how='outer')
+             .merge(enrollment_change(frl, ['district_code', 'school_code']), on=KEYS, how='outer')
+             .merge(read_cmas('SCHOOL'), on=KEYS, how='left'))
+    return panel
+
+
+def district_panel(attendance, frl):
+    """One row per district and year: student-weighted attendance, pooled FRL"""
+    keys = ['district_code', 'school_year']
+    rates = ['attendance_rate', 'truancy_rate', 'chronic_absent_rate']
+    weights = attendance[rates].notna().mul(attendance['student_count'], axis=0)
+    weighted = attendance[rates].mul(weights).groupby([attendance[k] for k in keys]).sum()
+    attendance_by_district = (weighted / weights.groupby([attendance[k] for k in keys]).sum()).reset_index()
+
+    totals = frl.groupby(keys, as_index=False)[['enrollment', 'frl_count']].sum(min_count=1)
+    totals['frl_pct'] = totals['frl_count'] / totals['enrollment'] * 100
+    panel = (attendance_by_district
+             .merge(totals[keys + ['frl_pct']], on=keys, how='outer')
+             .merge(enrollment_change(totals, ['district_code']), on=keys, how='outer')
+             .merge(read_cmas('DISTRICT'), on=keys, how='left'))
+    return panel
+
+
+def yearly_correlations(panel):
+    """Pearson, Spearman and pair counts per year, pairwise-complete"""
+    values = panel.set_index('school_year')[METRICS].astype(float)
+    grouped = values.groupby(level=0)
+    pearson = grouped.corr(method='pearson')
+    spearman = grouped.corr(method='spearman')
+    present = values.notna().astype(int)
+    pairs = present.groupby(level=0).apply(lambda g: g.T @ g)
+
+    results = {}
+    for year in sorted(values.index.unique()):
+        n = pairs.loc[year].to_numpy()
+        if n.max(initial=0) < MIN_OBSERVATIONS:
+            continue
+        results[year] = {
+            'pearson': _matrix(pearson.loc[year], n),
+            'spearman': _matrix(spearman.loc[year], n),
+            'pairs': n.astype(int).tolist(),
+        }
+    return results
+
+
+def _matrix(corr, n):
+    """Rounded matrix with null where a pair has too few observations"""
+    values = corr.reindex(index=METRICS, columns=METRICS).to_numpy()
+    values = np.where((n >= MIN_OBSERVATIONS) & ~np.isnan(values), values.round(3), np.nan)
+    return [[None if np.isnan(v) else float(v) for v in row] for row in values]
+
+
+def main():
+    start = time.time()
+    attendance = load_attendance_table()
+    frl = read_frl()
+    print(f"Loaded attendance ({len(attendance)} rows) and FRL ({len(frl)} rows) in {time.time() - start:.1f}s")
+
+    start = time.time()
+    levels = {
+        'school': yearly_correlations(school_panel(attendance, frl)),
+        'district': yearly_correlations(district_panel(attendance, frl)),
+    }
+    print(f"Correlations computed in {time.time() - start:.1f}s")
+
+    output = {
+        'generated': datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+        'metrics': METRICS,
+        'minObservations': MIN_OBSERVATIONS,
+        'levels': levels,
+    }
+    output_path = Path(sys.argv[1]) if len(sys.argv) > 1 else OUTPUT_JSON
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(output, f, indent=2)
+    print(f"✅ Saved correlation matrices to {output_path}")
+
+    for level, years in levels.items():
+        print(f"  {level}: {', '.join(years)}")
+    # Most recent year in which every metric pair could be correlated
+    year = max(levels['school'], key=lambda y: (sum(v is not None for row in levels['school'][y]['spearman']
+                                                    for v in row), y))
+    print(f"\n{year} school-level Spearman correlation with FRL %:")
+    frl_row = levels['school'][year]['spearman'][METRICS.index('frl_pct')]
+    for metric, value in zip(METRICS, frl_row):
+        print(f"  {metric}: {value}")
+
+
+if __name__ == "__main__":
+    main()
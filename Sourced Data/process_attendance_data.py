@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Statewide attendance ingestion
+Reads every workbook in "Attendance Data" (truancy files 2013-14 to 2022-23
+plus the 2023-24 attendance and chronic absenteeism files) in parallel worker
+processes and normalizes them into one school x year table for every
+Colorado district. The table is saved as Parquet and the DPS rows are
+exported into public/dps_schools_data_multi_year.json, with per-year tier
+counts, worst-school lists and histograms in public/dps_attendance_summary.json.
+
+Usage:
+  python process_attendance_data.py [attendance_dir]
+"""
+
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent
+ATTENDANCE_DIR = BASE_DIR / "Attendance Data"
+ATTENDANCE_TABLE = BASE_DIR / "attendance_by_school.parquet"
+SCHOOLS_JSON = BASE_DIR.parent / "public" / "dps_schools_data_multi_year.json"
+SUMMARY_JSON = BASE_DIR.parent / "public" / "dps_attendance_summary.json"
+
+DPS_DISTRICT_CODE = '0880'
+HEADER_ROW = 1  # every file has a title row above the header
+
+KEY_COLUMNS = ['school_year', 'district_code', 'district_name', 'school_code', 'school_name']
+VALUE_COLUMNS = ['student_count', 'attendance_rate', 'truancy_rate',
+                 'chronic_absent_count', 'chronic_absent_rate']
+
+# Summary panel metrics: table column, tier thresholds and which end is worse.
+# Chronic absenteeism tiers match the map legend; attendance tiers match the
+# below-90/80/70% counts in DPSSchoolsEnhanced.
+SUMMARY_METRICS = {
+    'chronicAbsentRate': {
+        'column': 'chronic_absent_rate',
+        'tiers': {'critical': 0.8, 'severe': 0.6, 'high': 0.5},
+        'higher_is_worse': True,
+    },
+    'attendanceRate': {
+        'column': 'attendance_rate',
+        'tiers': {'below90': 0.9, 'below80': 0.8, 'below70': 0.7},
+        'higher_is_worse': False,
+    },
+}
+WORST_N = 10
+HISTOGRAM_BINS = np.linspace(0, 1, 11)
+
+# Known attendance release layouts: field -> header label, whitespace
+# collapsed and footnote asterisks dropped ('Attendance Rate*' -> 'Attendance
+# Rate'). Rates are fractions of 1 in every release. A format is used only
+# when all of its labels are present; value fields a format lacks stay empty.
+_ID_COLUMNS = {
+    'district_code': 'District Code',
+    'district_name': 'District Name',
+    'school_code': 'School Code',
+    'school_name': 'School Name',
+}
+
+ATTENDANCE_FORMATS = {
+    # 2013-14 to 2015-16
+    'truancy_2013': dict(_ID_COLUMNS, **{
+        'student_count': 'Student Fall Enrollment',
+        'attendance_rate': 'Attendance Rate (Total Student Days Attended/Total Days Possible)',
+        'truancy_rate': 'Truancy Rate (Total Student Days Unexcused Absent/Total days Possible)',
+    }),
+    # 2016-17 to 2018-19
+    'truancy_2016': dict(_ID_COLUMNS, **{
+        'student_count': 'Student Fall PK-12 Enrollment',
+        'attendance_rate': 'Attendance Rate',
+        'truancy_rate': 'Truancy Rate',
+    }),
+    # 2019-20 to 2021-22
+    'truancy_2019': dict(_ID_COLUMNS, **{
+        'student_count': '{year} Students Counted',
+        'attendance_rate': 'Attendance Rate',
+        'truancy_rate': 'Truancy Rate',
+    }),
+    'truancy_2022': dict(_ID_COLUMNS, **{
+        'student_count': 'Student Count',
+        'attendance_rate': 'Attendance Rate',
+        'truancy_rate': 'Truancy Rate',
+    }),
+    'attendance_2023': dict(_ID_COLUMNS, **{
+        'student_count': 'PK-12 Student Count',
+        'attendance_rate': 'Attendance Rate',
+        'truancy_rate': 'Truancy Rate',
+    }),
+    'chronic_2023': dict(_ID_COLUMNS, **{
+        'student_count': 'K-12 Student Count',
+        'chronic_absent_count': 'Chronic Absent Count',
+        'chronic_absent_rate': 'Chronically Absent Rate',
+    }),
+}
+
+
+def school_year(file_path):
+    """'2016-2017' from a file name such as 2016-2017_TruancyData.xlsx"""
+    match = re.match(r'(\d{4}-\d{4})', Path(file_path).name)
+    if not match:
+        raise ValueError(f"No school year in file name: {Path(file_path).name}")
+    return match.group(1)
+
+
+def header_label(value):
+    """Collapse whitespace and drop footnote markers from a header cell"""
+    return ' '.join(str(value).split()).rstrip('*')
+
+
+def match_attendance_format(headers, year):
+    """Name of the registered format whose labels all appear in the headers"""
+    labels = {header_label(h) for h in headers}
+    for name, columns in ATTENDANCE_FORMATS.items():
+        if all(label.format(year=year) in labels for label in columns.values()):
+            return name
+    return None
+
+
+def read_attendance_file(file_path):
+    """Normalize one attendance workbook; returns (format name, table)
+
+    The table has KEY_COLUMNS + VALUE_COLUMNS plus a 'suppressed' flag that
+    is set when any value cell held a marker such as '*' instead of a number.
+    """
+    year = school_year(file_path)
+    raw = pd.read_excel(file_path, header=HEADER_ROW, dtype=str)
+    raw.columns = [header_label(c) for c in raw.columns]
+
+    name = match_attendance_format(raw.columns, year)
+    if name is None:
+        raise ValueError(f"Unknown attendance format for {Path(file_path).name}: headers={list(raw.columns)}")
+    columns = ATTENDANCE_FORMATS[name]
+
+    table = raw[[label.format(year=year) for label in columns.values()]].set_axis(list(columns), axis=1)
+    table = table.apply(lambda column: column.str.strip()).replace('', None)
+
+    # Drop title, district/state total and footnote rows
+    codes = table['district_code'].str.fullmatch(r'\d{4}', na=False) & \
+        table['school_code'].str.fullmatch(r'\d{4}', na=False)
+    table = table[codes].reindex(columns=KEY_COLUMNS + VALUE_COLUMNS)
+
+    values = table[VALUE_COLUMNS]
+    numbers = values.apply(pd.to_numeric, errors='coerce')
+    table['suppressed'] = (values.notna() & numbers.isna()).any(axis=1)
+    table[VALUE_COLUMNS] = numbers
+    table['school_year'] = year
+    return name, table.reset_index(drop=True)
+
+
+def build_attendance_table(attendance_dir=ATTENDANCE_DIR, workers=None):
+    """Read all attendance workbooks in parallel and combine them into one table"""
+    files = sorted(f for f in Path(attendance_dir).glob("*.xlsx") if not f.name.startswith('~$'))
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        results = list(executor.map(read_attendance_file, files))
+    frames = []
+    for file_path, (name, frame) in zip(files, results):
+        print(f"  {file_path.name}: {name}, {len(frame)} schools, {int(frame['suppressed'].sum())} suppressed")
+        frames.append(frame)
+
+    # 2023-24 comes as two files (attendance/truancy and chronic absenteeism):
+    # combine them into one row per school. Chronic rates are over K-12
+    # students, so that file's student count is listed first and wins.
+    combined = pd.concat(frames, ignore_index=True)
+    combined = combined.sort_values('chronic_absent_rate', key=lambda s: s.isna(), kind='stable')
+    keys = ['school_year', 'district_code', 'school_code']
+    aggregations = {column: 'first' for column in ['district_name', 'school_name'] + VALUE_COLUMNS}
+    aggregations['suppressed'] = 'any'
+    table = combined.groupby(keys, sort=True, as_index=False).agg(aggregations)
+    return table[KEY_COLUMNS + VALUE_COLUMNS + ['suppressed']]
+
+
+def load_attendance_table(table_path=ATTENDANCE_TABLE):
+    """Read the normalized attendance table written by main()"""
+    return pd.read_parquet(table_path)
+
+
+def _rate(value):
+    return None if pd.isna(value) else round(float(value), 3)
+
+
+def _count(value):
+    return None if pd.isna(value) else int(value)
+
+
+def attendance_record(row):
+    """Attendance entry in the shape the dashboard reads"""
+    has_chronic = not pd.isna(row.chronic_absent_rate)
+    has_attendance = not pd.isna(row.attendance_rate) or not pd.isna(row.truancy_rate)
+    if has_chronic and has_attendance:
+        metric_type = 'both'
+    elif has_chronic:
+        metric_type = 'chronicAbsenteeism'
+    else:
+        metric_type = 'attendanceRate'
+
+    student_count = _count(row.student_count)
+    # Same sanity bound the JS processor applied to reported student counts
+    if student_count is not None and not 0 < student_count < 5000:
+        student_count = None
+
+    return {
+        'year': row.school_year,
+        'metricType': metric_type,
+        'studentCount': student_count,
+        'attendanceRate': _rate(row.attendance_rate),
+        'truancyRate': _rate(row.truancy_rate),
+        'chronicAbsentRate': _rate(row.chronic_absent_rate),
+        'chronicAbsentCount': _count(row.chronic_absent_count),
+    }
+
+
+def match_school_codes(schools, dps_rows):
+    """Map each dashboard school name to a DPS school code
+
+    Names are matched against the most recent name for each code, exactly
+    first and then by containment, like the original JS processor did.
+    """
+    latest = dps_rows.sort_values('school_year').drop_duplicates('school_code', keep='last')
+    names = {code: name.lower().strip() for code, name in zip(latest['school_code'], latest['school_name'])}
+    by_name = {name: code for code, name in names.items()}
+
+    codes = {}
+    for school in schools:
+        search = school['name'].lower().strip()
+        code = by_name.get(search)
+        if code is None:
+            code = next((c for c, n in names.items() if n in search or search in n), None)
+        if code is not None:
+            codes[school['name']] = code
+    return codes
+
+
+def export_dps_attendance(table, json_path=SCHOOLS_JSON):
+    """Rebuild the per-school attendance block of dps_schools_data_multi_year.json
+
+    Returns the dashboard school name -> school code matches it used.
+    """
+    with open(json_path, encoding='utf-8') as f:
+        school_data = json.load(f)
+
+    dps_rows = table[table['district_code'] == DPS_DISTRICT_CODE]
+    codes = match_school_codes(school_data['schools'], dps_rows)
+    records = {}
+    for row in dps_rows.itertuples(index=False):
+        records.setdefault(row.school_code, {})[row.school_year] = attendance_record(row)
+
+    for school in school_data['schools']:
+        years = records.get(codes.get(school['name']), {})
+        school['attendance'] = {year: years[year] for year in sorted(years, reverse=True)}
+
+    school_data['generated'] = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(school_data, f, indent=2, ensure_ascii=False)
+    return codes
+
+
+def rate_histogram(rates):
+    """School counts per 10-point rate bin (rates above 1 land in the top bin)"""
+    counts, _ = np.histogram(np.clip(rates, 0, 1), bins=HISTOGRAM_BINS)
+    return counts.tolist()
+
+
+def metric_summary(dps, state, spec):
+    """Tier counts, worst schools and histograms for one metric in one year"""
+    rates = dps[spec['column']]
+    if spec['higher_is_worse']:
+        tiers = {tier: int((rates >= limit).sum()) for tier, limit in spec['tiers'].items()}
+    else:
+        tiers = {tier: int((rates < limit).sum()) for tier, limit in spec['tiers'].items()}
+    worst = dps.sort_values([spec['column'], 'name'], ascending=[not spec['higher_is_worse'], True]).head(WORST_N)
+    return {
+        'schoolCount': int(rates.count()),
+        'average': _rate(rates.mean()),
+        'tiers': tiers,
+        'worst': [{'name': row.name, 'rate': _rate(getattr(row, spec['column'])), 'studentCount': _count(row.student_count)}
+                  for row in worst.itertuples(index=False)],
+        'histogram': {'dps': rate_histogram(rates), 'state': rate_histogram(state[spec['column']])},
+    }
+
+
+def export_attendance_summary(table, codes, json_path=SUMMARY_JSON):
+    """Precompute the DPS summary panel for every year and metric"""
+    matched = pd.DataFrame(list(codes.items()), columns=['name', 'school_code'])
+    dps = table[table['district_code'] == DPS_DISTRICT_CODE].merge(matched, on='school_code')
+
+    years = {}
+    for metric, spec in SUMMARY_METRICS.items():
+        column = spec['column']
+        state_rows = table.dropna(subset=[column])
+        for year, group in dps.dropna(subset=[column]).groupby('school_year'):
+            state = state_rows[state_rows['school_year'] == year]
+            years.setdefault(year, {})[metric] = metric_summary(group, state, spec)
+
+    summary = {
+        'generated': datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+        'histogramBins': [round(float(edge), 1) for edge in HISTOGRAM_BINS],
+        'metrics': {metric: {'tiers': spec['tiers'], 'higherIsWorse': spec['higher_is_worse']}
+                    for metric, spec in SUMMARY_METRICS.items()},
+        'years': {year: years[year] for year in sorted(years, reverse=True)},
+    }
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    return summary
+
+
+def main():
+    attendance_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else ATTENDANCE_DIR
+
+    print(f"Reading attendance files from {attendance_dir}...")
+    table = build_attendance_table(attendance_dir)
+    table.to_parquet(ATTENDANCE_TABLE, index=False)
+    print(f"✅ Saved {len(table)} school-years to {ATTENDANCE_TABLE}")
+
+    coverage = table.groupby('school_year').agg(districts=('district_code', 'nunique'),
+                                                schools=('school_code', 'size'))
+    print(coverage.to_string())
+
+    table = load_attendance_table()
+    codes = export_dps_attendance(table)
+    print(f"✅ Attendance for {len(codes)} DPS schools written to {SCHOOLS_JSON}")
+
+    summary = export_attendance_summary(table, codes)
+    print(f"✅ Summary for {len(summary['years'])} years written to {SUMMARY_JSON}")
+
+
+if __name__ == "__main__":
+    main()
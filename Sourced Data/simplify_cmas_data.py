@@ -4,10 +4,11 @@ Simplify CMAS data for the Colorado District Map App
 Extracts only district-level, all-grades data with key metrics
 """
 
-import pandas as pd
 import json
 import sys
 
+from cmas_formats import detect_format, read_cmas_file
+
 def simplify_cmas_data(input_file, output_file):
     """
     Extract and simplify CMAS data for the mapping application.
@@ -25,52 +26,24 @@ def simplify_cmas_data(input_file, output_file):
     """
     
     try:
-        # Read Excel file
+        # Read Excel file using its registered CMAS layout
         print(f"Reading {input_file}...")
-        
-        # Try to auto-detect header row
-        df_preview = pd.read_excel(input_file, nrows=20)
-        
-        # If that doesn't work, try reading with no header and find it manually
-        if 'Level' not in df_preview.columns:
-            df_raw = pd.read_excel(input_file, header=None, nrows=50)
-            
-            # Find header row by looking for 'Level' column
-            header_row = 0
-            for i in range(len(df_raw)):
-                if 'Level' in str(df_raw.iloc[i].values):
-                    header_row = i
-                    break
-            
-            df = pd.read_excel(input_file, header=header_row)
-        else:
-            df = pd.read_excel(input_file)
-        
-        print(f"Found columns: {list(df.columns)}")
+        format_name, _ = detect_format(input_file)
+        print(f"Detected format: {format_name}")
+        df = read_cmas_file(input_file)
         
         # Filter for district-level, all-grades data
         filtered = df[
-            (df['Level'] == 'DISTRICT') & 
-            (df['Grade'] == 'All Grades')
+            (df['level'] == 'DISTRICT') & 
+            (df['grade'] == 'All Grades')
         ].copy()
         
         print(f"Filtered to {len(filtered)} district records")
         
-        # Identify key columns (common variations)
-        district_col = next((col for col in df.columns if 'District' in col and 'Name' in col), 'District Name')
-        subject_col = next((col for col in df.columns if 'Subject' in col), 'Subject')
-        year_col = next((col for col in df.columns if 'Year' in col), 'School Year')
-        
-        # Find percent met/exceeded column
-        pct_cols = [col for col in df.columns if 'Percent' in col and ('Met' in col or 'Exceeded' in col)]
-        pct_col = pct_cols[0] if pct_cols else 'Percent Met or Exceeded Expectations'
-        
         # Extract simplified data
-        simplified = filtered[[district_col, subject_col, year_col, pct_col]].copy()
+        simplified = filtered[['district_name', 'subject', 'year', 'pct_met_exceeded']].dropna().copy()
         simplified.columns = ['district', 'subject', 'year', 'percent_met_exceeded']
-        
-        # Clean year (extract just the year part if it's like "2023-2024")
-        simplified['year'] = simplified['year'].astype(str).str[:4]
+        simplified['year'] = simplified['year'].astype(str)
         
         # Convert to format matching the app's expected structure
         result = {}
@@ -108,6 +81,7 @@ def simplify_cmas_data(input_file, output_file):
     except Exception as e:
         print(f"Error processing file: {e}")
         print("Make sure pandas is installed: pip install pandas openpyxl")
+        print("Unknown layouts need an entry in cmas_formats.CMAS_FORMATS")
         sys.exit(1)
 
 if __name__ == "__main__":
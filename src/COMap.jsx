@@ -26,6 +26,8 @@ const COMap = () => {
   const [dpsSchoolData, setDpsSchoolData] = useState(null);
   const [selectedSchool, setSelectedSchool] = useState(null);
   const [dpsMapRef, setDpsMapRef] = useState(null);
+  const [statewideStats, setStatewideStats] = useState(null);
+  const [dpsAttendanceSummary, setDpsAttendanceSummary] = useState(null);
   const denverCounty1 = "Denver County 1";
 
 
@@ -55,6 +57,12 @@ const COMap = () => {
         setDistrictData(data);
       });
       
+    // Statewide min/max and quantile breakpoints precomputed by add_district_rankings.py
+    fetch(getAssetPath("district_statewide_stats.json"))
+      .then((res) => res.json())
+      .then((data) => setStatewideStats(data.metrics))
+      .catch(() => console.log("No statewide stats file found, computing in browser"));
+
     fetch(getAssetPath("district_name_mapping.json"))
       .then((res) => res.json())
       .then((data) => setNameMapping(data))
@@ -68,6 +76,12 @@ const COMap = () => {
         setDpsSchoolData(data);
       })
       .catch((err) => console.log("Error loading DPS school data:", err));
+
+    // Tier counts and worst-school lists precomputed by process_attendance_data.py
+    fetch(getAssetPath("dps_attendance_summary.json"))
+      .then((res) => res.json())
+      .then((data) => setDpsAttendanceSummary(data))
+      .catch(() => console.log("No attendance summary file found, computing in browser"));
   }, []);
 
   const getDistrictData = (name) => {
@@ -186,6 +200,18 @@ const COMap = () => {
 
   // Get performance metrics for all districts for the selected year
   const getPerformanceMetrics = () => {
+    if (statewideStats) {
+      const range = (metric) => {
+        const stats = statewideStats[metric]?.[selectedYear];
+        return stats ? { min: stats.min, max: stats.max } : { min: Infinity, max: -Infinity };
+      };
+      return {
+        enrollment: range('enrollment'),
+        frl: range('frl'),
+        cmas: range('cmas')
+      };
+    }
+
     const metrics = { enrollment: [], frl: [], cmas: [] };
     
     Object.entries(districtData).forEach(([districtName, data]) => {
@@ -715,7 +741,7 @@ const COMap = () => {
         </div>
           </>
         ) : (
-          <DPSSchoolsEnhanced />
+          <DPSSchoolsEnhanced attendanceSummary={dpsAttendanceSummary} />
         )}
       </div>
     </>
@@ -10,7 +10,7 @@ const getAssetPath = (filename) => {
   return base.endsWith('/') ? `${base}${filename}` : `${base}/${filename}`;
 };
 
-const DPSSchoolsEnhanced = () => {
+const DPSSchoolsEnhanced = ({ attendanceSummary }) => {
   const [schoolsData, setSchoolsData] = useState(null);
   const [budgetData, setBudgetData] = useState(null);
   const [copData, setCopData] = useState(null);
@@ -227,11 +227,35 @@ const DPSSchoolsEnhanced = () => {
     };
   };
 
+  // With no type or zone filter, the tier counts and worst-school list come
+  // precomputed from dps_attendance_summary.json (process_attendance_data.py)
+  const chronicMode = selectedYear === '2023-2024' && selectedMetric === 'chronic';
+  const precomputed = filterCategory === 'all' && filterZone === 'all'
+    ? attendanceSummary?.years[selectedYear]?.[chronicMode ? 'chronicAbsentRate' : 'attendanceRate']
+    : null;
+
   const currentStats = calculateStats(filteredSchools, selectedYear);
   const compareStats = compareMode ? calculateStats(filteredSchools, compareYear) : null;
+  // The summary's chronic tiers follow the map legend, not the >20%/>30% boxes, so only attendance tiers are used
+  if (precomputed && !chronicMode) {
+    currentStats.schoolsBelow90 = precomputed.tiers.below90;
+    currentStats.schoolsBelow80 = precomputed.tiers.below80;
+    currentStats.schoolsBelow70 = precomputed.tiers.below70;
+  }
+
+  // The summary lists names and rates; look the schools up for the list and detail panel
+  const summaryWorstSchools = (summary) => {
+    const schoolsByName = new Map(schoolsData.schools.map(school => [school.name, school]));
+    return summary.worst
+      .map(entry => {
+        const school = schoolsByName.get(entry.name);
+        return school && { ...school, attendanceRate: chronicMode ? 1 - entry.rate : entry.rate, displayMetric: entry.rate };
+      })
+      .filter(Boolean);
+  };
 
   // Get worst schools (lowest attendance)
-  const worstSchools = filteredSchools
+  const worstSchools = precomputed ? summaryWorstSchools(precomputed) : filteredSchools
     .filter(school => {
       const att = school.attendance[selectedYear];
       return att && (att.chronicAbsentRate !== null || att.attendanceRate !== null);